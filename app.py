@@ -1,15 +1,26 @@
 # app.py
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context
 from build_features import build_features
 from model import explain_score
+import latest_store
+import refresh_scheduler
+import chart_aggregates
+import rollups
+import score_store
+import db
+import write_behind
+import retention
+import parquet_export
+import metrics
+import profiling
 from apscheduler.schedulers.background import BackgroundScheduler
 import atexit
-from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, JSON, inspect, text
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import base64
 import pickle
 import os
+import time
 import nltk
 
 # Download punkt if not already available
@@ -27,39 +38,12 @@ app = Flask(
 )
 
 # ----------------- Database Setup -----------------
-engine = create_engine("sqlite:///scores.db", echo=False)
-Base = declarative_base()
-SessionLocal = sessionmaker(bind=engine)
-
-class ScoreRecord(Base):
-    __tablename__ = "scores"
-    id = Column(Integer, primary_key=True, index=True)
-    ticker = Column(String, index=True)
-    rule_score = Column(Integer)
-    ml_score = Column(Float, nullable=True)
-    final_score = Column(Float, nullable=True)
-    features = Column(JSON)
-    explanation = Column(JSON)
-    timestamp = Column(DateTime, default=datetime.utcnow)
-
-def ensure_schema():
-    insp = inspect(engine)
-    if "scores" in insp.get_table_names():
-        cols = [c["name"] for c in insp.get_columns("scores")]
-        needed = {"rule_score", "ml_score", "final_score"}
-        if not needed.issubset(cols):
-            print("⚠️ Old schema detected. Dropping and recreating 'scores' table...")
-            with engine.begin() as conn:
-                conn.execute(text("DROP TABLE IF EXISTS scores"))
-            Base.metadata.create_all(bind=engine)
-            print("✅ Table rebuilt with new schema.")
-        else:
-            print("✅ DB schema is up to date.")
-    else:
-        Base.metadata.create_all(bind=engine)
-        print("✅ Fresh table created.")
-
-ensure_schema()
+# score_rows/score_details (score_store) hold every score; legacy scores/snapshots
+# rows are imported once on first start
+score_store.ensure_schema()
+latest_store.ensure_schema()
+refresh_scheduler.ensure_schema()
+chart_aggregates.ensure_schema()
 # --------------------------------------------------
 
 # Load ML model (optional)
@@ -73,7 +57,71 @@ except Exception as e:
     ml_model = None
     ml_model_loaded = False
 
-latest_scores = {}
+# Upper bound on tickers scored concurrently within a single /predict request
+PREDICT_MAX_WORKERS = int(os.environ.get("PREDICT_MAX_WORKERS", 8))
+
+# ----------------- Scoring -----------------
+# scores are persisted by a background writer in batches; see write_behind.py
+score_writer = write_behind.ScoreWriter()
+
+def save_score(ticker, features, result):
+    with metrics.timed("score_enqueue"):
+        score_writer.submit(ticker, features, result, datetime.utcnow())
+
+def score_ticker(ticker):
+    """Fetch features for one ticker, score it and persist the record."""
+    with metrics.timed("build_features"):
+        features = build_features(ticker)
+    features["ticker"] = ticker  # important for explain_score
+
+    # use explain_score (handles rule + ml + events)
+    with metrics.timed("explain_score"):
+        result = explain_score(features)
+    save_score(ticker, features, result)
+    # rule_hits are the storage form of the explanation; responses keep the rendered text.
+    # A copy, because the write-behind queue still holds `result`.
+    result = {k: v for k, v in result.items() if k != "rule_hits"}
+    result["ticker"] = ticker
+    return result, features
+
+def safe_score_ticker(ticker):
+    """Like score_ticker, but a failure becomes an error entry for that ticker only."""
+    try:
+        result, _ = score_ticker(ticker)
+        return result
+    except Exception as e:
+        return {"ticker": ticker, "error": str(e)}
+
+def score_tickers(tickers, max_workers=PREDICT_MAX_WORKERS):
+    """Score tickers on a bounded thread pool; results come back in input order."""
+    workers = max(1, min(max_workers, len(tickers)))
+    if workers == 1:
+        return [safe_score_ticker(t) for t in tickers]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(safe_score_ticker, tickers))
+
+def iter_scores(tickers, max_workers=PREDICT_MAX_WORKERS):
+    """Yield (index, result) pairs in completion order, as soon as each ticker is scored."""
+    workers = max(1, min(max_workers, len(tickers)))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {pool.submit(safe_score_ticker, t): i for i, t in enumerate(tickers)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # client may disconnect mid-stream; drop whatever has not started yet
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def parse_tickers(data):
+    """Ticker list from a /predict body; ValueError for anything but a string or a list of strings."""
+    if data is not None and not isinstance(data, dict):
+        raise ValueError("body must be a JSON object")
+    tickers = (data or {}).get("tickers") or (data or {}).get("ticker")
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    if tickers is not None and not (isinstance(tickers, list) and all(isinstance(t, str) for t in tickers)):
+        raise ValueError("tickers must be a string or a list of strings")
+    return tickers
 
 # ----------------- FRONTEND -----------------
 # ✅ First page: Company Explorer (main.html)
@@ -93,106 +141,362 @@ def graphs_page(ticker):
 
 # ----------------- API Routes -----------------
 @app.route("/predict", methods=["POST"])
+@profiling.profiled
 def predict():
     try:
-        data = request.json
-        tickers = data.get("tickers") or data.get("ticker")
-
-        if not tickers:
-            return jsonify({"error": "Please provide at least one ticker symbol"}), 400
-
-        if isinstance(tickers, str):
-            tickers = [tickers]
+        tickers = parse_tickers(request.json)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid request: {e}"}), 400
+    if not tickers:
+        return jsonify({"error": "Please provide at least one ticker symbol"}), 400
 
-        results = []
-        db = SessionLocal()
+    try:
         for ticker in tickers:
-            features = build_features(ticker)
-            features["ticker"] = ticker  # important for explain_score
-
-            # use explain_score (handles rule + ml + events)
-            result = explain_score(features)
-
-            record = ScoreRecord(
-                ticker=ticker,
-                rule_score=result["rule_score"],
-                ml_score=result["ml_score"],
-                final_score=result["final_score"],
-                features=features,
-                explanation=result["explanation"]
-            )
-            db.add(record)
-            db.commit()
-
-            results.append(result)
-        db.close()
+            demand.hit(ticker)
+        # cProfile only sees the request thread, so profiled requests score inline
+        results = score_tickers(tickers, max_workers=1 if profiling.active() else PREDICT_MAX_WORKERS)
 
         return jsonify({"results": results})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/predict/stream", methods=["POST"])
+def predict_stream():
+    """Same input as /predict, but emits one NDJSON line per ticker as it completes."""
+    try:
+        tickers = parse_tickers(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid request: {e}"}), 400
+    if not tickers:
+        return jsonify({"error": "Please provide at least one ticker symbol"}), 400
+
+    for ticker in tickers:
+        demand.hit(ticker)
+
+    def generate():
+        for index, result in iter_scores(tickers):
+            yield app.json.dumps({"index": index, **result}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route("/latest", methods=["GET"])
 def get_latest():
-    return jsonify(latest_scores)
+    # cheap version check first so unchanged polls never touch the payloads
+    etag = str(latest_store.get_version())
+    if request.if_none_match.contains(etag):
+        metrics.cache_hit("latest_etag")
+        response = Response(status=304)
+    else:
+        metrics.cache_miss("latest_etag")
+        version, body = latest_store.get_latest_body()
+        etag = str(version)
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@app.route("/predict_one/<ticker>", methods=["GET"])
+def predict_one(ticker):
+    """Chart data for the graphs page, read from aggregates kept up to date on every score write."""
+    data = chart_aggregates.get_chart_data(ticker)
+    if data is None:
+        return jsonify({"error": f"No scores recorded for {ticker} yet"}), 404
+    return jsonify(data)
+
+HISTORY_FIELDS = ["ticker", "rule_score", "ml_score", "final_score", "features", "explanation", "rules", "events",
+                  "timestamp", "last_seen"]
+HISTORY_FIELD_SETS = {
+    "all": ["ticker", "rule_score", "ml_score", "final_score", "features", "explanation", "timestamp", "last_seen"],
+    "scores": ["ticker", "rule_score", "ml_score", "final_score", "timestamp", "last_seen"],
+}
+HISTORY_DEFAULT_LIMIT = 10
+HISTORY_MAX_LIMIT = 1000
+
+def encode_cursor(ts, record_id):
+    return base64.urlsafe_b64encode(f"{ts}|{record_id}".encode()).decode()
+
+def decode_cursor(cursor):
+    ts, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return score_store.format_ts(ts), int(record_id)
+
+def parse_utc(value):
+    """ISO-8601 string -> naive UTC datetime, matching how score_store keeps timestamps."""
+    # Python < 3.11 (runtime.txt pins 3.10) does not accept a trailing "Z"
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+def parse_fields(value):
+    if not value:
+        return HISTORY_FIELD_SETS["all"]
+    if value in HISTORY_FIELD_SETS:
+        return HISTORY_FIELD_SETS[value]
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = set(fields) - set(HISTORY_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+def history_entry(row, fields, details):
+    """Shape one score_rows row (plus its lazily loaded details) like the old /history records."""
+    entry = {}
+    for f in fields:
+        if f == "timestamp":
+            entry[f] = row["ts"]
+        elif f == "last_seen":
+            # unchanged re-observations only move last_seen forward (see score_store.insert_scores)
+            entry[f] = row["last_seen"] or row["ts"]
+        elif f == "features":
+            entry[f] = {c: row[c] for c in score_store.FEATURE_COLUMNS}
+            entry[f]["headlines"] = (details or {}).get("headlines") or []
+            entry[f]["errors"] = (details or {}).get("errors") or {}
+            entry[f]["ticker"] = row["ticker"]
+        elif f in ("explanation", "rules", "events"):
+            entry[f] = (details or {}).get(f) or []
+        else:
+            entry[f] = row[f]
+    return entry
 
 @app.route("/history/<ticker>", methods=["GET"])
+@profiling.profiled
 def get_history(ticker):
-    db = SessionLocal()
-    records = db.query(ScoreRecord).filter(ScoreRecord.ticker == ticker).order_by(ScoreRecord.timestamp.desc()).limit(10).all()
-    db.close()
-    return jsonify([
-        {
-            "ticker": r.ticker,
-            "rule_score": r.rule_score,
-            "ml_score": r.ml_score,
-            "final_score": r.final_score,
-            "features": r.features,
-            "explanation": r.explanation,
-            "timestamp": r.timestamp.isoformat()
-        } for r in records
-    ])
+    """Newest-first score history.
+
+    Query parameters: since/until (ISO-8601), limit (default 10, max 1000),
+    fields ("all", "scores" or a comma list, incl. "rules" for structured
+    explanations) and cursor (from X-Next-Cursor).
+    """
+    demand.hit(ticker)
+    try:
+        fields = parse_fields(request.args.get("fields"))
+        limit = min(max(int(request.args.get("limit", HISTORY_DEFAULT_LIMIT)), 1), HISTORY_MAX_LIMIT)
+        since = parse_utc(request.args["since"]) if request.args.get("since") else None
+        until = parse_utc(request.args["until"]) if request.args.get("until") else None
+        cursor = decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": f"Invalid history query: {e}"}), 400
+
+    # typed columns come from score_rows; details are only read if a field needs them
+    columns = ["ticker"] + [f for f in fields if f in score_store.SCORE_COLUMNS]
+    if "features" in fields:
+        columns += score_store.FEATURE_COLUMNS
+    if "last_seen" in fields:
+        columns.append("last_seen")
+    rows = score_store.query_rows(ticker, columns, since, until, cursor, limit + 1)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    details = {}
+    if {"features", "explanation", "rules", "events"} & set(fields):
+        details = score_store.load_details([r["id"] for r in rows])
+
+    response = jsonify([history_entry(r, fields, details.get(r["id"])) for r in rows])
+    if has_more:
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1]["ts"], rows[-1]["id"])
+    return response
+
+SERIES_DEFAULT_POINTS = 300
+# a source is used while it has at most this many rows per requested point
+SERIES_OVERSAMPLE = 4
+
+@app.route("/history/<ticker>/series", methods=["GET"])
+@profiling.profiled
+def get_history_series(ticker):
+    """At most max_points score points over [since, until), oldest first.
+
+    Reads raw scores for short ranges and hourly or daily rollups for long ones,
+    then LTTB-downsamples on final_score so the payload stays bounded.
+    """
+    demand.hit(ticker)
+    try:
+        max_points = min(max(int(request.args.get("max_points", SERIES_DEFAULT_POINTS)), 3), HISTORY_MAX_LIMIT)
+        since = parse_utc(request.args["since"]) if request.args.get("since") else None
+        until = parse_utc(request.args["until"]) if request.args.get("until") else None
+    except ValueError as e:
+        return jsonify({"error": f"Invalid series query: {e}"}), 400
+
+    budget = max_points * SERIES_OVERSAMPLE
+    # raw rows older than the retention cutoff are gone, so ranges reaching past it use rollups
+    cutoff = retention.raw_cutoff()
+    raw_complete = cutoff is None or (since is not None and since >= cutoff) or \
+        rollups.count_buckets(ticker, "day", since, min(until, cutoff) if until else cutoff) == 0
+    if raw_complete and score_store.count_range(ticker, since, until) <= budget:
+        source = "raw"
+        points = []
+        for r in score_store.query_rows(ticker, score_store.SCORE_COLUMNS + ["last_seen"], since, until,
+                                        newest_first=False):
+            # a deduplicated row stood unchanged from ts to last_seen: draw that span, clipped to the range
+            start, end = r["ts"], r["last_seen"] or r["ts"]
+            if since is not None:
+                start = max(start, score_store.format_ts(since))
+            if until is not None:
+                end = min(end, score_store.format_ts(until - timedelta(microseconds=1)))
+            point = {"timestamp": start, "rule_score": r["rule_score"],
+                     "ml_score": r["ml_score"], "final_score": r["final_score"]}
+            points.append(point)
+            if end > start:
+                points.append(dict(point, timestamp=end))
+    else:
+        source = "hour" if rollups.count_buckets(ticker, "hour", since, until) <= budget else "day"
+        points = [
+            {"timestamp": b["bucket_start"], "rule_score": b["rule"]["mean"],
+             "ml_score": b["ml"]["mean"], "final_score": b["final"]["mean"]}
+            for b in rollups.get_rollups(ticker, source, since, until)
+        ]
+
+    if len(points) > max_points:
+        xs = [datetime.fromisoformat(p["timestamp"]).timestamp() for p in points]
+        ys = [p["final_score"] or 0.0 for p in points]
+        points = [points[i] for i in rollups.lttb(xs, ys, max_points)]
+
+    return jsonify({"ticker": ticker, "source": source, "points": points})
+
+@app.route("/rollups/<ticker>", methods=["GET"])
+def get_ticker_rollups(ticker):
+    """Hourly or daily min/max/mean/last of each score (bucket=hour|day, optional since/until)."""
+    try:
+        since = parse_utc(request.args["since"]) if request.args.get("since") else None
+        until = parse_utc(request.args["until"]) if request.args.get("until") else None
+        buckets = rollups.get_rollups(ticker, request.args.get("bucket", "hour"), since, until)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(buckets)
 
 # ----------------- Scheduler -----------------
+REFRESH_TICK_SECONDS = float(os.environ.get("REFRESH_TICK_SECONDS", 60))
+REFRESH_MIN_INTERVAL_MINUTES = float(os.environ.get("REFRESH_MIN_INTERVAL_MINUTES", 2))
+REFRESH_MAX_INTERVAL_MINUTES = float(os.environ.get("REFRESH_MAX_INTERVAL_MINUTES", 60))
+# Provider budget: at most this many tickers are fetched per tick
+REFRESH_BUDGET_PER_TICK = int(os.environ.get("REFRESH_BUDGET_PER_TICK", 100))
+REFRESH_MAX_WORKERS = int(os.environ.get("REFRESH_MAX_WORKERS", 8))
+LEASE_TTL_SECONDS = float(os.environ.get("SCHEDULER_LEASE_TTL", 60))
+LATEST_BATCH_SIZE = 50
+RETENTION_INTERVAL_MINUTES = float(os.environ.get("RETENTION_INTERVAL_MINUTES", 60))
+
+# Every gunicorn worker runs the scheduler, but only the lease holder refreshes
+leader_lease = refresh_scheduler.LeaderLease(f"refresh:{refresh_scheduler.host_id()}", ttl=LEASE_TTL_SECONDS)
+
+refresh_queue = refresh_scheduler.PriorityRefreshQueue(
+    min_interval=REFRESH_MIN_INTERVAL_MINUTES * 60,
+    max_interval=REFRESH_MAX_INTERVAL_MINUTES * 60
+)
+demand = refresh_scheduler.DemandCounter()
+
+def renew_lease():
+    was_leader = leader_lease.held
+    if leader_lease.try_acquire() and not was_leader:
+        print(f"[Scheduler] {leader_lease.holder} is now the refresh leader")
+    demand.flush()
+
 def refresh_scores():
-    tickers_to_track = ["TSLA", "AAPL", "MSFT"]
-    global latest_scores
-    db = SessionLocal()
-    for ticker in tickers_to_track:
-        try:
-            features = build_features(ticker)
-            features["ticker"] = ticker
-            result = explain_score(features)
-
-            latest_scores[ticker] = {
-                "rule_score": result["rule_score"],
-                "ml_score": result["ml_score"],
-                "final_score": result["final_score"],
-                "features": features,
-                "explanation": result["explanation"],
-                "timestamp": datetime.utcnow().isoformat()
-            }
-
-            record = ScoreRecord(
-                ticker=ticker,
-                rule_score=result["rule_score"],
-                ml_score=result["ml_score"],
-                final_score=result["final_score"],
-                features=features,
-                explanation=result["explanation"]
-            )
-            db.add(record)
-            db.commit()
-
-            print(f"[Scheduler] Updated {ticker}: rule={result['rule_score']}, ml={result['ml_score']}, final={result['final_score']}")
-        except Exception as e:
-            print(f"[Scheduler] Error updating {ticker}: {e}")
-    db.close()
+    if not leader_lease.try_acquire():
+        return
+
+    refresh_queue.sync(refresh_scheduler.shard_universe(refresh_scheduler.load_universe()))
+    tickers_to_track = refresh_queue.pop_due(REFRESH_BUDGET_PER_TICK)
+    if not tickers_to_track:
+        return
+    # popped tickers are out of the heap; anything not rescheduled below must be put back
+    handled = set()
+    try:
+        ticker_demand = refresh_scheduler.load_demand(tickers_to_track)
+        started = time.time()
+        errors = 0
+        pending = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(REFRESH_MAX_WORKERS, len(tickers_to_track)))) as pool:
+            futures = {pool.submit(score_ticker, ticker): ticker for ticker in tickers_to_track}
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    result, features = future.result()
+                except Exception as e:
+                    errors += 1
+                    refresh_queue.retry_later(ticker)
+                    handled.add(ticker)
+                    print(f"[Scheduler] Error updating {ticker}: {e}")
+                    continue
+
+                refresh_queue.observe(ticker, features, ticker_demand.get(ticker, 0.0))
+                handled.add(ticker)
+
+                pending[ticker] = {
+                    "rule_score": result["rule_score"],
+                    "ml_score": result["ml_score"],
+                    "final_score": result["final_score"],
+                    "features": features,
+                    "explanation": result["explanation"],
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+                if len(pending) >= LATEST_BATCH_SIZE:
+                    latest_store.put_latest(pending)
+                    pending = {}
+
+                print(f"[Scheduler] Updated {ticker}: rule={result['rule_score']}, ml={result['ml_score']}, final={result['final_score']}")
+
+        if pending:
+            latest_store.put_latest(pending)
+
+        duration = time.time() - started
+        backlog = refresh_queue.backlog()
+        metrics.observe("scheduler_cycle", duration)
+        metrics.set_gauge("scheduler_queue_depth", backlog)
+        metrics.set_gauge("scheduler_tracked_tickers", len(refresh_queue))
+        metrics.set_gauge("scheduler_last_cycle_seconds", duration)
+        overran = refresh_scheduler.record_cycle(started, duration, REFRESH_TICK_SECONDS, len(tickers_to_track),
+                                                 errors, backlog)
+        print(f"[Scheduler] Tick done: {len(tickers_to_track)} tickers, {errors} errors in {duration:.1f}s "
+              f"({duration / REFRESH_TICK_SECONDS:.0%} of tick, {backlog} still due{', OVERRAN' if overran else ''})")
+    except Exception as e:
+        lost = [t for t in tickers_to_track if t not in handled]
+        for ticker in lost:
+            refresh_queue.retry_later(ticker)
+        print(f"[Scheduler] Tick failed, {len(lost)} tickers requeued: {e}")
+
+def run_retention():
+    """Archive new rows to Parquet, then expire old raw rows and details and vacuum; leader only."""
+    if not leader_lease.held:
+        return
+    if parquet_export.available():
+        exported = parquet_export.export()
+        print(f"[Export] appended {exported['rows']} rows in {exported['files']} Parquet file(s)")
+    stats = retention.run()
+    print(f"[Retention] removed {stats['raw_rows']} raw rows, {stats['details']} detail payloads, "
+          f"{stats['legacy_rows']} legacy rows; vacuumed {stats['vacuum_pages']} pages; "
+          f"DB {stats['bytes'] / 1e6:.1f} MB")
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/scheduler/status", methods=["GET"])
+def scheduler_status():
+    return jsonify({
+        "leader": leader_lease.held,
+        "holder": leader_lease.holder,
+        "tick_s": REFRESH_TICK_SECONDS,
+        "tracked": len(refresh_queue),
+        "backlog": refresh_queue.backlog(),
+        "cycles": refresh_scheduler.recent_cycles()
+    })
+
+def shutdown_scheduler():
+    scheduler.shutdown()
+    score_writer.close()
+    leader_lease.release()
+    db.close_all()
 
 scheduler = BackgroundScheduler()
-scheduler.add_job(func=refresh_scores, trigger="interval", minutes=10)
+scheduler.add_job(func=renew_lease, trigger="interval", seconds=max(1, LEASE_TTL_SECONDS / 3))
+scheduler.add_job(func=refresh_scores, trigger="interval", seconds=REFRESH_TICK_SECONDS)
+scheduler.add_job(func=run_retention, trigger="interval", minutes=RETENTION_INTERVAL_MINUTES)
 scheduler.start()
-atexit.register(lambda: scheduler.shutdown())
+atexit.register(shutdown_scheduler)
 
 # ----------------- Run -----------------
 if __name__ == "__main__":
@@ -0,0 +1,280 @@
+# backtest.py
+"""Walk-forward backtest of the rule, ML and blended scores over the stored score history.
+
+The history is cut into consecutive test windows of --test-days. For each one the ML
+model is fitted only on the --train-days before it (or everything before it with
+--expanding) and evaluated on the window, so no future rows leak into training. Per
+window and score it reports:
+
+    ic         Spearman correlation of the score with the ticker's next change_1d
+    stability  mean absolute score change between a ticker's consecutive observations
+    rmse       (ml only) out-of-time error against rule_score, the training label
+
+"blend" is 0.5 * rule + 0.5 * ml as in explain_score, without the headline event
+adjustment (headlines are not in the typed columns); "stored" is the final_score
+that was recorded live.
+
+The rows are sorted by time once and cached as .npy under BACKTEST_CACHE_DIR, keyed
+by database and last row id, so every fold is a contiguous slice of one memory map
+shared by the worker processes, and reruns on an unchanged database skip the load.
+
+    python backtest.py --db synthetic.db
+    python backtest.py --train-days 365 --test-days 30 --expanding --workers 8 --report bt.json
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+import db
+import parquet_export
+import score_store
+import train_model
+
+DB_PATH = "scores.db"
+CACHE_DIR = os.environ.get("BACKTEST_CACHE_DIR", os.path.join("exports", "backtest"))
+REPORT_PATH = "backtest_report.json"
+TRAIN_DAYS = float(os.environ.get("BACKTEST_TRAIN_DAYS", 180))
+TEST_DAYS = float(os.environ.get("BACKTEST_TEST_DAYS", 30))
+# per-fold training rows (uniform sample) and forest size; the live model uses 200 trees on everything
+FOLD_TRAIN_ROWS = int(os.environ.get("BACKTEST_FOLD_TRAIN_ROWS", 50000))
+FOLD_TREES = int(os.environ.get("BACKTEST_FOLD_TREES", 50))
+WORKERS = int(os.environ.get("BACKTEST_WORKERS", os.cpu_count() or 1))
+
+N_FEATURES = len(score_store.FEATURE_COLUMNS)
+# columns of the cached matrix after the features
+RULE, STORED, FWD = N_FEATURES, N_FEATURES + 1, N_FEATURES + 2
+SCORES = ("rule", "ml", "blend", "stored")
+
+# -------------------------------
+# Time-sorted matrix cache
+# -------------------------------
+def _read_rows(db_path: str, export_dir: str, chunk_rows: int = train_model.TRAIN_CHUNK_ROWS):
+    """(ticker, ts as epoch seconds, features + rule_score + final_score) in arbitrary order."""
+    columns = score_store.FEATURE_COLUMNS + ["rule_score", "final_score"]
+    tickers, ts, data = [], [], []
+    if parquet_export.available():
+        parquet_export.export(db_path, export_dir)
+        for batch in parquet_export.iter_batches(["ticker", "ts"] + columns, export_dir=export_dir,
+                                                 batch_size=chunk_rows):
+            tickers.append(batch.column(0).to_numpy(zero_copy_only=False))
+            ts.append(batch.column(1).cast("int64").to_numpy() // 1_000_000)
+            data.append(np.column_stack([batch.column(i).to_numpy(zero_copy_only=False).astype(np.float32)
+                                         for i in range(2, batch.num_columns)]))
+    else:
+        con = db.connect(db_path)
+        try:
+            cur = con.execute(f"SELECT ticker, ts, {', '.join(columns)} FROM score_rows")
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                tickers.append(np.array([r[0] for r in rows], dtype=object))
+                ts.append(np.array([r[1] for r in rows], dtype="datetime64[us]").astype(np.int64) // 1_000_000)
+                data.append(np.array([r[2:] for r in rows], dtype=np.float32))  # NULL -> NaN
+        finally:
+            con.close()
+    if not data:
+        return np.empty(0, dtype=object), np.empty(0, dtype=np.int64), np.empty((0, len(columns)), np.float32)
+    return np.concatenate(tickers), np.concatenate(ts), np.concatenate(data)
+
+def _forward_change(codes: np.ndarray, ts: np.ndarray, change: np.ndarray) -> np.ndarray:
+    """Each row's ticker's next change_1d (NaN for its last observation)."""
+    order = np.lexsort((ts, codes))
+    fwd = np.full(len(codes), np.nan, dtype=np.float32)
+    same = codes[order][1:] == codes[order][:-1]
+    fwd[order[:-1][same]] = change[order[1:][same]]
+    return fwd
+
+def build_cache(db_path: str = DB_PATH, export_dir: str = parquet_export.EXPORT_DIR,
+                cache_dir: str = CACHE_DIR) -> Dict:
+    """Write the time-sorted matrix for `db_path` unless an up-to-date one is cached; returns its meta."""
+    con = db.connect(db_path)
+    try:
+        last_id, count = con.execute("SELECT coalesce(max(id), 0), COUNT(*) FROM score_rows").fetchone()
+    finally:
+        con.close()
+    key = {"db": os.path.abspath(db_path), "last_id": last_id, "count": count}
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if {k: meta.get(k) for k in key} == key:
+            return meta
+
+    tickers, ts, values = _read_rows(db_path, export_dir)
+    codes, names = pd.factorize(tickers)
+    fwd = _forward_change(codes, ts, values[:, 0])
+    order = np.argsort(ts, kind="stable")
+
+    # only our own files, meta first so a half-written cache is never taken as current;
+    # cache_dir is user-supplied and may be shared with other exports
+    for name in ("meta.json", "ts.npy", "ticker.npy", "data.npy"):
+        path = os.path.join(cache_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(os.path.join(cache_dir, "ts.npy"), ts[order])
+    np.save(os.path.join(cache_dir, "ticker.npy"), codes[order].astype(np.int32))
+    np.save(os.path.join(cache_dir, "data.npy"), np.column_stack([values[order], fwd[order]]))
+    meta = dict(key, rows=int(len(ts)), tickers=int(len(names)))
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return meta
+
+_cache = {}
+
+def _attach(cache_dir: str):
+    # read-only memory maps; a fold is a [lo, hi) row slice of these
+    for name in ("ts", "ticker", "data"):
+        _cache[name] = np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode="r")
+
+# -------------------------------
+# Folds
+# -------------------------------
+def _spearman(a: np.ndarray, b: np.ndarray) -> Optional[float]:
+    ok = ~(np.isnan(a) | np.isnan(b))
+    if ok.sum() < 3:
+        return None
+    # average ranks for ties, as in scipy's rankdata
+    ra, rb = pd.Series(a[ok]).rank().to_numpy(), pd.Series(b[ok]).rank().to_numpy()
+    if ra.std() == 0 or rb.std() == 0:
+        return None
+    return float(np.corrcoef(ra, rb)[0, 1])
+
+def _stability(codes: np.ndarray, score: np.ndarray) -> Optional[float]:
+    # rows are in time order, so a stable sort by ticker keeps each ticker's rows chronological
+    order = np.argsort(codes, kind="stable")
+    same = codes[order][1:] == codes[order][:-1]
+    if not same.any():
+        return None
+    s = score[order]
+    return float(np.nanmean(np.abs(s[1:] - s[:-1])[same]))
+
+def _run_fold(fold: Dict, trees: int, train_rows: int, seed: int) -> Dict:
+    data, codes = _cache["data"], _cache["ticker"]
+    train = data[fold["train"][0]:fold["train"][1]]
+    if len(train) > train_rows:
+        idx = np.sort(np.random.default_rng(seed + fold["index"]).choice(len(train), train_rows, replace=False))
+        train = train[idx]
+    test = np.asarray(data[fold["test"][0]:fold["test"][1]])
+    test_codes = np.asarray(codes[fold["test"][0]:fold["test"][1]])
+
+    started = time.perf_counter()
+    model = RandomForestRegressor(n_estimators=trees, min_samples_leaf=2, random_state=seed, n_jobs=1)
+    model.fit(np.nan_to_num(train[:, :N_FEATURES]), train[:, RULE])
+    ml = np.clip(model.predict(np.nan_to_num(test[:, :N_FEATURES])), 0, 100).astype(np.float32)
+    fit_s = time.perf_counter() - started
+
+    scores = {
+        "rule": test[:, RULE],
+        "ml": ml,
+        "blend": np.clip(0.5 * test[:, RULE] + 0.5 * ml, 0, 100),
+        "stored": test[:, STORED],
+    }
+    out = {k: fold[k] for k in ("index", "test_start", "test_end")}
+    out.update(train_rows=int(len(train)), test_rows=int(len(test)),
+               tickers=int(len(np.unique(test_codes))), fit_s=fit_s,
+               ml_rmse=float(np.sqrt(np.nanmean((ml - test[:, RULE]) ** 2))))
+    for name, s in scores.items():
+        out[name] = {"mean": float(np.nanmean(s)), "ic": _spearman(s, test[:, FWD]),
+                     "stability": _stability(test_codes, s)}
+    return out
+
+def plan_folds(ts: np.ndarray, train_days: float, test_days: float, expanding: bool) -> List[Dict]:
+    """Row ranges of consecutive test windows and the training window before each."""
+    if not len(ts):
+        return []
+    day = 86400
+    first, last = int(ts[0]), int(ts[-1])
+    folds, start = [], first + int(train_days * day)
+    while start <= last:
+        end = start + int(test_days * day)
+        train_lo = 0 if expanding else int(np.searchsorted(ts, start - int(train_days * day)))
+        lo, hi = np.searchsorted(ts, [start, end])
+        if hi > lo and lo > train_lo:
+            folds.append({
+                "index": len(folds), "train": (int(train_lo), int(lo)), "test": (int(lo), int(hi)),
+                "test_start": datetime.utcfromtimestamp(start).isoformat(),
+                "test_end": datetime.utcfromtimestamp(end).isoformat(),
+            })
+        start = end
+    return folds
+
+def run(db_path: str = DB_PATH, train_days: float = TRAIN_DAYS, test_days: float = TEST_DAYS,
+        expanding: bool = False, workers: int = WORKERS, trees: int = FOLD_TREES,
+        train_rows: int = FOLD_TRAIN_ROWS, export_dir: str = parquet_export.EXPORT_DIR,
+        cache_dir: str = CACHE_DIR, report_path: Optional[str] = REPORT_PATH) -> Dict:
+    """Backtest every window in parallel; returns (and writes) the per-window and summary report."""
+    score_store.ensure_schema(db_path)  # imports legacy snapshots on first use
+    started = time.time()
+    meta = build_cache(db_path, export_dir, cache_dir)
+    load_s = time.time() - started
+
+    _attach(cache_dir)
+    folds = plan_folds(_cache["ts"], train_days, test_days, expanding)
+    _cache.clear()
+    with ProcessPoolExecutor(max_workers=max(1, workers), initializer=_attach, initargs=(cache_dir,)) as pool:
+        windows = list(pool.map(_run_fold, folds, [trees] * len(folds), [train_rows] * len(folds),
+                                [train_model.SEED] * len(folds)))
+
+    summary = {"ml_rmse": _mean([w["ml_rmse"] for w in windows])}
+    for name in SCORES:
+        summary[name] = {k: _mean([w[name][k] for w in windows]) for k in ("mean", "ic", "stability")}
+    report = {
+        "db": meta["db"], "rows": meta["rows"], "tickers": meta["tickers"],
+        "train_days": train_days, "test_days": test_days, "expanding": expanding,
+        "trees": trees, "fold_train_rows": train_rows, "workers": workers,
+        "load_s": load_s, "elapsed_s": time.time() - started,
+        "summary": summary, "windows": windows,
+    }
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+def _mean(values) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return float(np.mean(values)) if values else None
+
+def _fmt(value, spec=".3f") -> str:
+    return "—" if value is None else format(value, spec)
+
+def print_report(report: Dict):
+    print(f"\n{'window':<12} {'rows':>8} {'ml rmse':>8} " + " ".join(f"{s + ' ic':>9}" for s in SCORES)
+          + " " + " ".join(f"{s + ' Δ':>9}" for s in SCORES))
+    rows = report["windows"] + [dict(report["summary"], test_start="mean", test_rows=report["rows"])]
+    for w in rows:
+        print(f"{w['test_start'][:10]:<12} {w['test_rows']:>8} {_fmt(w['ml_rmse'], '.2f'):>8} "
+              + " ".join(f"{_fmt(w[s]['ic']):>9}" for s in SCORES) + " "
+              + " ".join(f"{_fmt(w[s]['stability'], '.2f'):>9}" for s in SCORES))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--export-dir", default=parquet_export.EXPORT_DIR)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--train-days", type=float, default=TRAIN_DAYS)
+    parser.add_argument("--test-days", type=float, default=TEST_DAYS)
+    parser.add_argument("--expanding", action="store_true", help="train on all history before each window")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--trees", type=int, default=FOLD_TREES)
+    parser.add_argument("--fold-train-rows", type=int, default=FOLD_TRAIN_ROWS)
+    parser.add_argument("--report", default=REPORT_PATH)
+    args = parser.parse_args()
+
+    report = run(args.db, args.train_days, args.test_days, args.expanding, args.workers, args.trees,
+                 args.fold_train_rows, args.export_dir, args.cache_dir, args.report)
+    print_report(report)
+    print(f"\n✅ Backtested {len(report['windows'])} windows over {report['rows']} rows / {report['tickers']} tickers "
+          f"in {report['elapsed_s']:.1f}s (load {report['load_s']:.1f}s); report in {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# benchmarks/bench_concurrency.py
+"""Reader and writer throughput on scores.db while a scheduler-like writer is running.
+
+Run from the repo root:
+    python benchmarks/bench_concurrency.py                          # WAL vs rollback journal
+    python benchmarks/bench_concurrency.py --modes wal --readers 16 --duration 20
+    python benchmarks/bench_concurrency.py --no-pool                # open a connection per call
+
+One writer thread inserts score rows and /latest entries in batches, like refresh_scores;
+reader threads run the /history, /latest and trend queries against the same file.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import db
+import latest_store
+import score_store
+
+SEED = 1234
+
+def percentile(sorted_values, q: float):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+def fake_score(rng: random.Random, ticker: str, ts: datetime):
+    features = {c: rng.gauss(0, 1) for c in score_store.FEATURE_COLUMNS}
+    features["headlines"] = [f"{ticker} headline {i}" for i in range(5)]
+    rule = rng.uniform(30, 90)
+    result = {"rule_score": rule, "ml_score": rule + rng.gauss(0, 3), "final_score": rule,
+              "rule_hits": [(rule_id, 0.1, 0) for rule_id in range(1, 8)], "events": []}
+    return ticker, ts, features, result
+
+def seed(db_path: str, tickers, rows_per_ticker: int):
+    score_store.ensure_schema(db_path)
+    latest_store.ensure_schema(db_path)
+    rng = random.Random(SEED)
+    start = datetime(2025, 1, 1)
+    for t in tickers:
+        score_store.insert_scores(
+            [fake_score(rng, t, start + timedelta(hours=i)) for i in range(rows_per_ticker)], db_path=db_path
+        )
+
+# -------------------------------
+# Workers
+# -------------------------------
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.rows = 0
+        self.errors = 0
+
+    def add(self, elapsed: float, rows: int = 0):
+        with self.lock:
+            self.latencies.append(elapsed)
+            self.rows += rows
+
+    def error(self):
+        with self.lock:
+            self.errors += 1
+
+def writer(db_path: str, tickers, batch: int, interval: float, stop: threading.Event, stats: Stats):
+    rng = random.Random(SEED)
+    while not stop.is_set():
+        chosen = rng.sample(tickers, min(batch, len(tickers)))
+        now = datetime.utcnow()
+        start = time.perf_counter()
+        try:
+            score_store.insert_scores([fake_score(rng, t, now) for t in chosen], db_path=db_path)
+            latest_store.put_latest({t: {"ticker": t, "final_score": rng.uniform(30, 90)} for t in chosen},
+                                    db_path=db_path)
+            stats.add(time.perf_counter() - start, len(chosen))
+        except sqlite3.OperationalError:
+            stats.error()
+        if interval:
+            stop.wait(interval)
+
+def reader(db_path: str, tickers, seed: int, stop: threading.Event, stats: Stats):
+    rng = random.Random(seed)
+    ops = ("history", "latest", "trend")
+    while not stop.is_set():
+        op, ticker = rng.choice(ops), rng.choice(tickers)
+        start = time.perf_counter()
+        try:
+            if op == "history":
+                rows = score_store.query_rows(ticker, score_store.SCORE_COLUMNS + ["ticker"], limit=10, db_path=db_path)
+                score_store.load_details([r["id"] for r in rows], db_path=db_path)
+            elif op == "latest":
+                latest_store.get_latest_body(db_path=db_path)
+            else:
+                score_store.latest_final_scores(ticker, 7, db_path=db_path)
+            stats.add(time.perf_counter() - start, 1)
+        except sqlite3.OperationalError:
+            stats.error()
+
+def run_mode(mode: str, args) -> dict:
+    db.JOURNAL_MODE = mode
+    db.POOL_SIZE = 0 if args.no_pool else args.pool_size
+    db.close_all()
+    tickers = [f"SYN{i:04d}" for i in range(args.tickers)]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "bench.db")
+        seed(db_path, tickers, args.rows_per_ticker)
+
+        stop = threading.Event()
+        w_stats, r_stats = Stats(), Stats()
+        threads = [threading.Thread(target=writer, args=(db_path, tickers, args.write_batch, args.write_interval,
+                                                         stop, w_stats))]
+        threads += [threading.Thread(target=reader, args=(db_path, tickers, SEED + i, stop, r_stats))
+                    for i in range(args.readers)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(args.duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+        db.close_all()
+
+    reads, ticks = sorted(r_stats.latencies), sorted(w_stats.latencies)
+    return {
+        "mode": mode,
+        "write_rows_s": w_stats.rows / wall,
+        "write_tick_p50_ms": percentile(ticks, 50) * 1000,
+        "write_tick_p95_ms": percentile(ticks, 95) * 1000,
+        "write_errors": w_stats.errors,
+        "reads_s": r_stats.rows / wall,
+        "read_p50_ms": percentile(reads, 50) * 1000,
+        "read_p95_ms": percentile(reads, 95) * 1000,
+        "read_p99_ms": percentile(reads, 99) * 1000,
+        "read_mean_ms": (statistics.mean(reads) * 1000) if reads else 0.0,
+        "read_errors": r_stats.errors,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="wal,delete", help="comma list of journal modes to compare")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per mode")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--rows-per-ticker", type=int, default=100, help="history seeded before the run")
+    parser.add_argument("--write-batch", type=int, default=50, help="tickers per writer tick")
+    parser.add_argument("--write-interval", type=float, default=0.0, help="seconds between writer ticks")
+    parser.add_argument("--pool-size", type=int, default=db.POOL_SIZE)
+    parser.add_argument("--no-pool", action="store_true", help="close connections instead of reusing them")
+    args = parser.parse_args()
+
+    print(f"📊 SQLite concurrency: {args.readers} readers + 1 writer, {args.duration}s per mode, "
+          f"pool={'off' if args.no_pool else args.pool_size}")
+    results = [run_mode(m.strip().upper(), args) for m in args.modes.split(",") if m.strip()]
+
+    print(f"\n{'mode':<8} {'write rows/s':>13} {'tick p50':>9} {'tick p95':>9} {'reads/s':>9} "
+          f"{'read p50':>9} {'read p95':>9} {'read p99':>9} {'errors':>7}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['write_rows_s']:>13.0f} {r['write_tick_p50_ms']:>9.1f} {r['write_tick_p95_ms']:>9.1f} "
+              f"{r['reads_s']:>9.0f} {r['read_p50_ms']:>9.2f} {r['read_p95_ms']:>9.2f} {r['read_p99_ms']:>9.2f} "
+              f"{r['write_errors'] + r['read_errors']:>7}")
+
+if __name__ == "__main__":
+    main()
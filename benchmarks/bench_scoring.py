@@ -0,0 +1,225 @@
+# benchmarks/bench_scoring.py
+"""Offline micro-benchmarks for the scoring hot path.
+
+Run from the repo root:
+    python benchmarks/bench_scoring.py                  # compare against benchmarks/baseline.json
+    python benchmarks/bench_scoring.py --save-baseline  # record a new baseline
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # model.py loads ml_model.pkl relative to the working directory
+
+import build_features as build_features_module
+import data_store
+import db
+import model
+import score_store
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+BATCH_SIZES = (1, 10, 100)
+SEED = 1234
+
+HEADLINE_TEMPLATES = [
+    "{co} announces record profit in third quarter",
+    "{co} faces lawsuit over product safety",
+    "Analysts upgrade {co} after strong guidance",
+    "{co} shares slip as market waits on rate decision",
+    "{co} unveils new product line at annual event",
+    "Regulators open investigation into {co} accounting",
+    "{co} signs partnership with European supplier",
+    "{co} trading flat ahead of earnings",
+]
+
+# -------------------------------
+# Synthetic inputs (fixed seed so every run times the same work)
+# -------------------------------
+def make_features(rng: random.Random, ticker: str) -> dict:
+    co = ticker.title()
+    return {
+        "ticker": ticker,
+        "change_1d": rng.gauss(0, 2.5),
+        "pe_ratio": max(rng.gauss(25, 15), 0.0),
+        "debt_to_equity": max(rng.gauss(120, 80), 0.0),
+        "market_cap": 10 ** rng.uniform(9, 12.5),
+        "eps": rng.gauss(3, 4),
+        "book_value": rng.gauss(20, 15),
+        "news_sentiment": max(min(rng.gauss(0.05, 0.2), 1.0), -1.0),
+        "headlines": [t.format(co=co) for t in rng.sample(HEADLINE_TEMPLATES, 5)],
+        "errors": {"yahoo": None, "alpha": None, "news": None},
+    }
+
+def make_batch(n: int):
+    rng = random.Random(SEED + n)
+    return [make_features(rng, f"SYN{i:04d}") for i in range(n)]
+
+def stub_providers():
+    """Swap the network fetchers used by build_features for deterministic local stubs."""
+    rng = random.Random(SEED)
+    build_features_module.get_stock_data_yahoo = lambda t: {
+        "close_price": 100.0, "change_1d": rng.gauss(0, 2.5), "pe_ratio": 25.0,
+        "debt_to_equity": 120.0, "error": None}
+    build_features_module.get_stock_data_alpha = lambda t: {
+        "market_cap": 2e11, "eps": 3.2, "book_value": 18.0, "error": None}
+    build_features_module.get_news_sentiment = lambda t: {
+        "headlines": [h.format(co=t) for h in HEADLINE_TEMPLATES[:5]], "sentiment": 0.05, "error": None}
+
+def seed_scores_db(path: str, tickers, rows_per_ticker: int = 200):
+    score_store.ensure_schema(path)
+    start = datetime(2025, 1, 1)
+    rng = random.Random(SEED)
+    score_store.insert_scores(
+        [(t, start + timedelta(minutes=10 * i), {}, {"rule_score": 60, "final_score": rng.uniform(30, 90)})
+         for t in tickers for i in range(rows_per_ticker)],
+        details=False, with_rollups=False, db_path=path,
+    )
+
+# -------------------------------
+# Cases: each returns a function that processes one batch
+# -------------------------------
+def build_cases(tmpdir: str):
+    cases = {}
+
+    cases["rule_based_score"] = lambda batch: [model.rule_based_score(f) for f in batch]
+
+    nlp = model.nlp
+    def detect_textblob(batch):
+        model.nlp = None
+        try:
+            return [model.detect_events(f["headlines"]) for f in batch]
+        finally:
+            model.nlp = nlp
+    cases["detect_events[textblob]"] = detect_textblob
+    if nlp is not None:
+        cases["detect_events[textblob+spacy]"] = lambda batch: [model.detect_events(f["headlines"]) for f in batch]
+
+    ml_model = model.ml_model
+    def explain_without_model(batch):
+        model.ml_model = None
+        try:
+            return [model.explain_score(f) for f in batch]
+        finally:
+            model.ml_model = ml_model
+    cases["explain_score[no model]"] = explain_without_model
+    if ml_model is not None:
+        cases["explain_score[model]"] = lambda batch: [model.explain_score(f) for f in batch]
+
+    scores_db = os.path.join(tmpdir, "trend.db")
+    seed_scores_db(scores_db, [f"SYN{i:04d}" for i in range(max(BATCH_SIZES))])
+    def trend(batch):
+        old, model.DB_PATH = model.DB_PATH, scores_db
+        try:
+            return [model.get_score_trend(f["ticker"]) for f in batch]
+        finally:
+            model.DB_PATH = old
+    cases["get_score_trend"] = trend
+
+    snapshots_db = os.path.join(tmpdir, "snapshots.db")
+    data_store.ensure_schema(snapshots_db)
+    ts = datetime(2025, 1, 1, tzinfo=timezone.utc).isoformat()
+    def insert(batch):
+        for f in batch:
+            data_store.insert_snapshot(dict(f, ts=ts), f["ticker"], 70, None, 70, db_path=snapshots_db)
+    cases["data_store.insert_snapshot"] = insert
+
+    stub_providers()
+    cases["build_features[stubbed]"] = lambda batch: [build_features_module.build_features(f["ticker"]) for f in batch]
+
+    return cases
+
+# -------------------------------
+# Timing
+# -------------------------------
+def time_case(fn, batch, repeat: int):
+    """Median and min seconds per item over `repeat` timed runs, after one warm-up run."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(batch)
+        samples = []
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn(batch)
+                samples.append((time.perf_counter() - start) / len(batch))
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+    return statistics.median(samples), min(samples)
+
+def run(repeat: int, batch_sizes):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cases = build_cases(tmpdir)
+        for name, fn in cases.items():
+            for n in batch_sizes:
+                median, best = time_case(fn, make_batch(n), repeat)
+                results[f"{name}@{n}"] = {"median_us": round(median * 1e6, 2), "min_us": round(best * 1e6, 2)}
+                print(f"  {name:<32} batch={n:<4} median={median * 1e6:10.1f} µs/item  min={best * 1e6:10.1f}")
+        db.close_all()
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Cases whose median is more than `tolerance` slower than the baseline."""
+    regressions = []
+    print(f"\n{'case':<40} {'baseline':>12} {'now':>12} {'ratio':>7}")
+    for key, now in results.items():
+        base = baseline.get(key)
+        if not base:
+            print(f"{key:<40} {'-':>12} {now['median_us']:>12.1f} {'new':>7}")
+            continue
+        ratio = now["median_us"] / base["median_us"] if base["median_us"] else float("inf")
+        flag = "  ⚠️" if ratio > 1 + tolerance else ""
+        print(f"{key:<40} {base['median_us']:>12.1f} {now['median_us']:>12.1f} {ratio:>6.2f}x{flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=7, help="timed runs per case and batch size")
+    parser.add_argument("--batch-sizes", type=lambda s: [int(x) for x in s.split(",")], default=list(BATCH_SIZES))
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if any case regressed")
+    args = parser.parse_args()
+
+    print(f"📊 Scoring micro-benchmarks (repeat={args.repeat}, spaCy={'yes' if model.nlp else 'no'}, "
+          f"model={'yes' if model.ml_model else 'no'})")
+    results = run(args.repeat, args.batch_sizes)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\n📦 Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} case(s) slower than baseline by more than {args.tolerance:.0%}")
+        if args.fail_on_regression:
+            sys.exit(1)
+    else:
+        print("\n✅ No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
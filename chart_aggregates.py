@@ -0,0 +1,160 @@
+# chart_aggregates.py
+import bisect
+import json
+import sqlite3
+from datetime import datetime
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+import db
+import score_store
+
+DB_PATH = "scores.db"
+
+# Points kept in each ticker's trend series
+TREND_POINTS = 50
+
+# One row per ticker, updated whenever a score is written, so the graphs
+# page reads a single row instead of re-fetching and re-explaining.
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS chart_aggregates (
+  ticker TEXT PRIMARY KEY,
+  trend TEXT NOT NULL,
+  shap_sums TEXT NOT NULL,
+  shap_count INTEGER NOT NULL,
+  positive INTEGER NOT NULL,
+  neutral INTEGER NOT NULL,
+  negative INTEGER NOT NULL,
+  updated_at TEXT NOT NULL
+);
+"""
+
+def ensure_schema(db_path: str = DB_PATH):
+    con = db.connect(db_path)
+    try:
+        cur = con.cursor()
+        for stmt in SCHEMA_SQL.strip().split(";"):
+            s = stmt.strip()
+            if s:
+                cur.execute(s)
+        con.commit()
+    finally:
+        con.close()
+
+def update_aggregates(ticker: str, result: Dict[str, Any], timestamp: Optional[datetime] = None,
+                      db_path: str = DB_PATH):
+    """Fold one explain_score result into the ticker's trend, mean |SHAP| and event counts."""
+    update_many([(ticker, result, timestamp or datetime.utcnow())], db_path=db_path)
+
+def update_many(entries: Iterable[Tuple[str, Dict[str, Any], datetime]], db_path: str = DB_PATH,
+                con: Optional[sqlite3.Connection] = None):
+    """Fold several (ticker, result, timestamp) entries in one transaction.
+
+    Pass `con` to join the caller's transaction (the caller commits, and should have
+    begun it IMMEDIATE).
+    """
+    if con is not None:
+        for ticker, result, timestamp in entries:
+            _fold(con, ticker, result, timestamp)
+        return
+    con = db.connect(db_path, timeout=10, isolation_level=None)
+    try:
+        # IMMEDIATE so concurrent writers for the same ticker serialize instead of losing updates
+        con.execute("BEGIN IMMEDIATE")
+        for ticker, result, timestamp in entries:
+            _fold(con, ticker, result, timestamp)
+        con.execute("COMMIT")
+    finally:
+        con.close()
+
+def _fold(con, ticker: str, result: Dict[str, Any], timestamp: datetime):
+    row = con.execute(
+        """
+        SELECT trend, shap_sums, shap_count, positive, neutral, negative
+        FROM chart_aggregates WHERE ticker = ?
+        """,
+        (ticker,),
+    ).fetchone()
+    if row:
+        trend, shap_sums, shap_count = json.loads(row[0]), json.loads(row[1]), row[2]
+        counts = row[3:]
+    else:
+        trend = {"timestamps": [], "final": [], "rule": [], "ml": []}
+        shap_sums, shap_count = {}, 0
+        counts = (0, 0, 0)
+
+    # naive-UTC text like score_rows.ts (graphs.js appends "Z"); older rows may hold "+00:00" points
+    stamps = [score_store.format_ts(t) for t in trend["timestamps"]]
+    if stamps != trend["timestamps"]:
+        order = sorted(range(len(stamps)), key=stamps.__getitem__)
+        trend = {key: [(stamps if key == "timestamps" else trend[key])[j] for j in order] for key in trend}
+    timestamp = score_store.format_ts(timestamp)
+
+    # concurrent /predict workers can commit slightly out of order; keep the series sorted
+    i = bisect.bisect(trend["timestamps"], timestamp)
+    trend["timestamps"].insert(i, timestamp)
+    trend["final"].insert(i, result["final_score"])
+    trend["rule"].insert(i, result["rule_score"])
+    trend["ml"].insert(i, result["ml_score"])
+    for key in trend:
+        trend[key] = trend[key][-TREND_POINTS:]
+
+    shap_values = result.get("ml_feature_importance") or {}
+    if shap_values:
+        for name, value in shap_values.items():
+            shap_sums[name] = shap_sums.get(name, 0.0) + abs(float(value))
+        shap_count += 1
+
+    # event mix reflects the headlines behind the newest score, not a running total,
+    # since consecutive refreshes mostly see the same articles
+    if trend["timestamps"][-1] == timestamp:
+        impacts = [e.get("impact") for e in result.get("events") or []]
+        counts = (impacts.count("positive"), impacts.count("neutral"), impacts.count("negative"))
+
+    con.execute(
+        """
+        INSERT OR REPLACE INTO chart_aggregates
+        (ticker, trend, shap_sums, shap_count, positive, neutral, negative, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            ticker,
+            json.dumps(trend),
+            json.dumps(shap_sums),
+            shap_count,
+            *counts,
+            trend["timestamps"][-1],
+        ),
+    )
+
+def get_chart_data(ticker: str, db_path: str = DB_PATH) -> Optional[Dict[str, Any]]:
+    """Chart payload in the shape static/graphs.js expects, or None if the ticker was never scored."""
+    con = db.connect(db_path)
+    try:
+        row = con.execute(
+            """
+            SELECT trend, shap_sums, shap_count, positive, neutral, negative, updated_at
+            FROM chart_aggregates WHERE ticker = ?
+            """,
+            (ticker,),
+        ).fetchone()
+    finally:
+        con.close()
+    if row is None:
+        return None
+
+    trend, shap_sums, shap_count, positive, neutral, negative, updated_at = row
+    importances = sorted(
+        ((name, total / shap_count) for name, total in json.loads(shap_sums).items()),
+        key=lambda kv: kv[1],
+        reverse=True,
+    ) if shap_count else []
+    return {
+        "ticker": ticker,
+        "trends": json.loads(trend),
+        "features": {
+            "names": [name for name, _ in importances],
+            "values": [round(value, 4) for _, value in importances],
+        },
+        "sentiment": {"positive": positive, "neutral": neutral, "negative": negative},
+        "updated_at": updated_at,
+    }
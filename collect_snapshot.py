@@ -1,40 +1,198 @@
 # backend/collect_snapshot.py
+"""Collect score snapshots for one ticker or a whole universe in a single process.
+
+    python collect_snapshot.py TSLA
+    python collect_snapshot.py --universe tickers.txt --workers 16
+    python collect_snapshot.py --universe tickers.txt --restart     # ignore earlier progress
+
+Models are loaded once, tickers are fetched and scored on a bounded thread pool, and
+snapshots are written in batched transactions. Each batch updates the chart aggregates
+and records its tickers in collector_progress in the same transaction, so an interrupted
+run started again with the same --run-id (for --universe, by default its file name and
+the UTC date) skips what is stored.
+"""
+import argparse
+import contextlib
+import os
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
+from typing import Dict, List, Set
 from dotenv import load_dotenv
 load_dotenv()
 
 from build_features import build_features
 from model import explain_score
-from data_store import ensure_schema, insert_snapshot, recent_count
+import chart_aggregates
+import db
+import refresh_scheduler
+import score_store
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python collect_snapshot.py <TICKER>")
-        sys.exit(1)
+DB_PATH = "scores.db"
+
+COLLECT_WORKERS = int(os.environ.get("COLLECT_WORKERS", 8))
+# snapshots per write transaction (and per checkpoint)
+COLLECT_BATCH_SIZE = int(os.environ.get("COLLECT_BATCH_SIZE", 100))
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS collector_progress (
+  run_id TEXT NOT NULL,
+  ticker TEXT NOT NULL,
+  ts TEXT NOT NULL,
+  PRIMARY KEY (run_id, ticker)
+) WITHOUT ROWID;
+"""
+
+def ensure_schema(db_path: str = DB_PATH):
+    score_store.ensure_schema(db_path)
+    chart_aggregates.ensure_schema(db_path)
+    con = db.connect(db_path)
+    try:
+        con.executescript(SCHEMA_SQL)
+        con.commit()
+    finally:
+        con.close()
+
+def default_run_id(universe: str = None) -> str:
+    """Universe runs resume within the same UTC day; tickers given on the command line always run."""
+    now = datetime.now(timezone.utc)
+    if universe:
+        return f"{os.path.basename(universe)}@{now:%Y-%m-%d}"
+    return f"cli@{now.isoformat(timespec='seconds')}"
+
+# -------------------------------
+# Progress checkpoints
+# -------------------------------
+def completed(run_id: str, db_path: str = DB_PATH) -> Set[str]:
+    con = db.connect(db_path)
+    try:
+        return {r[0] for r in con.execute("SELECT ticker FROM collector_progress WHERE run_id = ?", (run_id,))}
+    finally:
+        con.close()
 
-    ticker = sys.argv[1].upper()
+def reset_progress(run_id: str, db_path: str = DB_PATH):
+    con = db.connect(db_path)
+    try:
+        con.execute("DELETE FROM collector_progress WHERE run_id = ?", (run_id,))
+        con.commit()
+    finally:
+        con.close()
 
-    ensure_schema()
+def write_batch(run_id: str, batch: List, db_path: str = DB_PATH):
+    """Store (ticker, ts, features, result) snapshots, their chart aggregates and progress, atomically."""
+    con = db.connect(db_path, timeout=30)
+    try:
+        # IMMEDIATE: the chart aggregate fold reads then rewrites each ticker's row
+        con.execute("BEGIN IMMEDIATE")
+        score_store.insert_scores(batch, source="collector", con=con)
+        chart_aggregates.update_many([(ticker, result, ts) for ticker, ts, _, result in batch], con=con)
+        con.executemany(
+            "INSERT OR REPLACE INTO collector_progress (run_id, ticker, ts) VALUES (?, ?, ?)",
+            [(run_id, ticker, score_store.format_ts(ts)) for ticker, ts, _, _ in batch],
+        )
+        con.commit()
+    finally:
+        con.close()
+
+# -------------------------------
+# Collection
+# -------------------------------
+def collect_one(ticker: str):
     features = build_features(ticker)
+    features["ticker"] = ticker
+    ts = datetime.now(timezone.utc)
+    result = explain_score(features)
+    return ticker, ts, features, result
+
+def collect(tickers: List[str], run_id: str, workers: int = COLLECT_WORKERS, batch_size: int = COLLECT_BATCH_SIZE,
+            db_path: str = DB_PATH, log=sys.stdout) -> Dict[str, int]:
+    """Fetch, score and store every ticker not yet recorded for `run_id`."""
+    done = completed(run_id, db_path)
+    todo = [t for t in tickers if t not in done]
+    stats = {"total": len(tickers), "skipped": len(tickers) - len(todo), "stored": 0, "failed": 0}
+    if stats["skipped"]:
+        print(f"⏩ Resuming {run_id}: {stats['skipped']} of {len(tickers)} tickers already stored", file=log)
+
+    started = last_report = time.time()
+    pending, batch = {}, []
+    remaining = iter(todo)
+
+    def flush():
+        if batch:
+            write_batch(run_id, batch, db_path)
+            stats["stored"] += len(batch)
+            batch.clear()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        # at most two tickers per worker in flight, so memory does not grow with the universe
+        for ticker in remaining:
+            pending[pool.submit(collect_one, ticker)] = ticker
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                ticker = pending.pop(fut)
+                try:
+                    batch.append(fut.result())
+                except Exception as e:
+                    # not checkpointed, so a resumed run tries it again
+                    stats["failed"] += 1
+                    print(f"❌ {ticker}: {e}", file=log)
+                nxt = next(remaining, None)
+                if nxt is not None:
+                    pending[pool.submit(collect_one, nxt)] = nxt
+            if len(batch) >= batch_size:
+                flush()
+            if time.time() - last_report >= 5 or not pending:
+                last_report = time.time()
+                n = stats["stored"] + len(batch) + stats["failed"]
+                rate = n / max(time.time() - started, 1e-9)
+                eta = (len(todo) - n) / rate if rate else 0
+                print(f"📊 {n}/{len(todo)} tickers, {rate:.1f}/s, {stats['failed']} failed, ETA {eta:.0f}s",
+                      file=log, flush=True)
+        flush()
+
+    stats["elapsed_s"] = time.time() - started
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tickers", nargs="*", help="tickers to collect (or use --universe)")
+    parser.add_argument("--universe", help="file with one ticker per line ('#' comments)")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--workers", type=int, default=COLLECT_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=COLLECT_BATCH_SIZE)
+    parser.add_argument("--run-id", help="progress key; rerun with the same id to resume")
+    parser.add_argument("--restart", action="store_true", help="forget progress recorded for this run id")
+    parser.add_argument("--verbose", action="store_true", help="keep the per-ticker scoring output")
+    args = parser.parse_args()
 
-    # ✅ ensure timestamp always exists
-    features["ts"] = features.get("ts") or datetime.now(timezone.utc).isoformat()
+    tickers = refresh_scheduler.normalize_tickers(args.tickers)
+    if args.universe:
+        tickers += [t for t in refresh_scheduler.read_universe_file(args.universe) if t not in tickers]
+    if not tickers:
+        parser.error("give at least one ticker or --universe FILE")
 
-    # rule-based score
-    rule_score, explanation = explain_score(features)
+    ensure_schema(args.db)
+    run_id = args.run_id or default_run_id(args.universe)
+    if args.restart:
+        reset_progress(run_id, args.db)
 
-    insert_snapshot(
-        features,
-        ticker,
-        rule_score,
-        ml_score=None,       # ML not yet
-        final_score=rule_score
-    )
+    log = sys.stdout
+    quiet = len(tickers) > 1 and not args.verbose
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull if quiet else log):
+            stats = collect(tickers, run_id, args.workers, args.batch_size, args.db, log)
+    except KeyboardInterrupt:
+        print(f"\n⏸ Interrupted; run again with --run-id {run_id!r} to resume")
+        sys.exit(130)
 
-    print(f"✅ snapshot stored for {ticker} @ {features['ts']}")
-    print(f"   rule_score={rule_score} | headlines={len(features.get('headlines', []))}")
-    print(f"   total rows in DB: {recent_count()}")
+    print(f"✅ {stats['stored']} snapshots stored ({stats['skipped']} already done, {stats['failed']} failed) "
+          f"for run {run_id} in {stats['elapsed_s']:.1f}s "
+          f"({stats['stored'] / max(stats['elapsed_s'], 1e-9):.1f} tickers/s)")
+    print(f"   total rows in DB: {score_store.count_rows(db_path=args.db)}")
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,9 @@
 # backend/data_store.py
-import sqlite3
 from typing import Optional, Dict, Any
 
+import db
+import score_store
+
 DB_PATH = "scores.db"
 
 SCHEMA_SQL = """
@@ -24,7 +26,7 @@ CREATE INDEX IF NOT EXISTS idx_snapshots_ticker_ts ON snapshots(ticker, ts);
 """
 
 def ensure_schema(db_path: str = DB_PATH):
-    con = sqlite3.connect(db_path)
+    con = db.connect(db_path)
     try:
         cur = con.cursor()
         for stmt in SCHEMA_SQL.strip().split(";"):
@@ -34,6 +36,8 @@ def ensure_schema(db_path: str = DB_PATH):
         con.commit()
     finally:
         con.close()
+    # snapshots is kept only so old databases can be migrated; new rows go to score_rows
+    score_store.ensure_schema(db_path)
 
 def insert_snapshot(
     features: Dict[str, Any],
@@ -43,40 +47,9 @@ def insert_snapshot(
     final_score: float,
     db_path: str = DB_PATH,
 ):
-    con = sqlite3.connect(db_path)
-    try:
-        cur = con.cursor()
-        cur.execute(
-            """
-            INSERT INTO snapshots
-            (ts, ticker, change_1d, debt_to_equity, pe_ratio, market_cap, eps, book_value,
-             news_sentiment, rule_score, ml_score, final_score)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                features.get("ts"),
-                ticker,
-                float(features.get("change_1d", 0) or 0),
-                float(features.get("debt_to_equity", 0) or 0),
-                float(features.get("pe_ratio", 0) or 0),
-                float(features.get("market_cap", 0) or 0),
-                float(features.get("eps", 0) or 0),
-                float(features.get("book_value", 0) or 0),
-                float(features.get("news_sentiment", 0) or 0),
-                float(rule_score if rule_score is not None else 0),
-                float(ml_score if ml_score is not None else 0),
-                float(final_score if final_score is not None else rule_score),
-            ),
-        )
-        con.commit()
-    finally:
-        con.close()
+    result = {"rule_score": rule_score, "ml_score": ml_score, "final_score": final_score}
+    return score_store.insert_score(ticker, features, result, ts=features.get("ts"), source="collector",
+                                    db_path=db_path)
 
 def recent_count(db_path: str = DB_PATH):
-    con = sqlite3.connect(db_path)
-    try:
-        cur = con.cursor()
-        cur.execute("SELECT COUNT(*) FROM snapshots")
-        return cur.fetchone()[0]
-    finally:
-        con.close()
+    return score_store.count_rows(db_path)
@@ -0,0 +1,103 @@
+# db.py
+"""One way to open SQLite for the whole project: WAL, tuned pragmas and pooled reuse.
+
+Modules keep their usual pattern
+
+    con = db.connect(db_path)
+    try:
+        ...
+    finally:
+        con.close()
+
+but close() hands the connection back to a per-file pool instead of closing it,
+so the connection setup and pragmas are paid once per pooled connection.
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+DB_PATH = "scores.db"
+
+# WAL lets readers keep going while the scheduler writes; NORMAL sync is safe under WAL
+JOURNAL_MODE = os.environ.get("DB_JOURNAL_MODE", "WAL")
+SYNCHRONOUS = os.environ.get("DB_SYNCHRONOUS", "NORMAL")
+CACHE_KB = int(os.environ.get("DB_CACHE_KB", 16384))
+MMAP_BYTES = int(os.environ.get("DB_MMAP_BYTES", 256 * 1024 * 1024))
+BUSY_TIMEOUT_S = float(os.environ.get("DB_BUSY_TIMEOUT_S", 10))
+# idle connections kept per database file; 0 closes every connection on release
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+
+_lock = threading.Lock()
+_pools: Dict[str, List["PooledConnection"]] = {}
+_pid = os.getpid()
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() returns it to the pool."""
+
+    pool_key: Optional[str] = None
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+        self.row_factory = None
+        self.isolation_level = ""
+        if not _release(self):
+            super().close()
+
+def _key(db_path: str) -> str:
+    return db_path if db_path == ":memory:" else os.path.abspath(db_path)
+
+def _configure(con: sqlite3.Connection):
+    # only takes effect on new files; retention.py --convert switches existing ones
+    con.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    con.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}")
+    con.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+    con.execute(f"PRAGMA cache_size = {-CACHE_KB}")
+    con.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+    con.execute("PRAGMA temp_store = MEMORY")
+
+def _release(con: PooledConnection) -> bool:
+    # in-memory databases are private to their connection, so they are never shared
+    if con.pool_key is None or con.pool_key == ":memory:":
+        return False
+    with _lock:
+        pool = _pools.setdefault(con.pool_key, [])
+        if os.getpid() != _pid or len(pool) >= POOL_SIZE or con in pool:
+            return False
+        pool.append(con)
+        return True
+
+def _reset_after_fork():
+    # connections inherited from a parent process must not be reused
+    global _pid
+    if os.getpid() != _pid:
+        _pools.clear()
+        _pid = os.getpid()
+
+def connect(db_path: str = DB_PATH, timeout: Optional[float] = None, isolation_level: Optional[str] = "") -> sqlite3.Connection:
+    """A configured connection to `db_path`, reused from the pool when one is idle."""
+    key = _key(db_path)
+    con = None
+    with _lock:
+        _reset_after_fork()
+        pool = _pools.get(key)
+        if pool:
+            con = pool.pop()
+    if con is None:
+        con = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_S, factory=PooledConnection, check_same_thread=False)
+        con.pool_key = key
+        _configure(con)
+    con.execute(f"PRAGMA busy_timeout = {int((BUSY_TIMEOUT_S if timeout is None else timeout) * 1000)}")
+    con.isolation_level = isolation_level
+    return con
+
+def close_all():
+    """Close every idle pooled connection (on shutdown, or before deleting a database file)."""
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        for con in pool:
+            con.pool_key = None
+            sqlite3.Connection.close(con)
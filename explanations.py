@@ -0,0 +1,48 @@
+# explanations.py
+"""Structured rule explanations: model.rule_based_score emits (rule, value, delta) records,
+score_store keeps them as small typed rows, and the English sentence is rendered on read.
+
+Rule ids are stored in the database, so never renumber or reuse one; add new ids instead.
+"""
+from collections import namedtuple
+from typing import Dict, Iterable, List
+
+RuleHit = namedtuple("RuleHit", ["rule", "value", "delta"])
+
+# id -> (name, template); templates may use {value} and {delta}
+RULES = {
+    1: ("stock_fell", "Stock fell {value:.2f}% → {delta:+} points"),
+    2: ("stock_rose", "Stock rose {value:.2f}% → {delta:+} points"),
+    3: ("stock_flat", "Stock change {value:.2f}% → no major effect"),
+    4: ("high_debt", "High debt ratio {value:.2f} → {delta:+} points"),
+    5: ("debt_stable", "Debt ratio {value:.2f} is stable → no penalty"),
+    6: ("high_pe", "High P/E ratio {value:.2f} → {delta:+} points"),
+    7: ("pe_reasonable", "P/E ratio {value:.2f} is reasonable → {delta:+} points"),
+    8: ("large_cap", "Large market cap company → {delta:+} points"),
+    9: ("small_cap", "Smaller market cap company → {delta:+} points"),
+    10: ("profitable", "Profitable with EPS {value} → {delta:+} points"),
+    11: ("no_eps", "No EPS data or negative → {delta:+} points"),
+    12: ("book_value", "Positive book value {value} → {delta:+} points"),
+    13: ("news_sentiment", "News sentiment {value:.2f} → {delta:+} points"),
+}
+RULE_IDS = {name: rule_id for rule_id, (name, _) in RULES.items()}
+
+def hit(name: str, value: float, delta: int) -> RuleHit:
+    return RuleHit(RULE_IDS[name], value, delta)
+
+def render(record) -> str:
+    rule, value, delta = record
+    name, template = RULES.get(rule, (None, None))
+    if template is None:
+        return f"Rule {rule}: value {value} → {delta:+} points"
+    return template.format(value=value, delta=delta)
+
+def render_all(records: Iterable) -> List[str]:
+    return [render(r) for r in records]
+
+def to_dicts(records: Iterable) -> List[Dict]:
+    """JSON-friendly records for API consumers that want the structured form."""
+    return [
+        {"rule": RULES.get(rule, (f"rule_{rule}",))[0], "value": value, "delta": delta}
+        for rule, value, delta in records
+    ]
@@ -0,0 +1,166 @@
+# feature_cache.py
+"""Persistent training matrix: float32 features + rule_score, appended by score_rows id.
+
+    exports/feature_matrix/matrix.npy   rows x (features + label), memory-mapped on load
+    exports/feature_matrix/meta.json    {"last_id": ..., "rows": ..., "columns": [...], "db": ...}
+
+update() reads only rows with id above last_id and writes them past the end of
+matrix.npy, so an hourly retrain costs the new rows rather than the whole history.
+meta.json is written last and its "rows" is authoritative: rows from an append that
+died before it are ignored and overwritten by the next one.
+
+    python feature_cache.py --db synthetic.db     # bring the cache up to date
+    python feature_cache.py --rebuild             # start over
+"""
+import argparse
+import io
+import json
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+import db
+import metrics
+import score_store
+
+DB_PATH = "scores.db"
+CACHE_DIR = os.environ.get("FEATURE_CACHE_DIR", os.path.join("exports", "feature_matrix"))
+CHUNK_ROWS = int(os.environ.get("FEATURE_CACHE_CHUNK_ROWS", 100000))
+
+COLUMNS = score_store.FEATURE_COLUMNS + ["rule_score"]
+
+def _paths(cache_dir: str) -> Tuple[str, str]:
+    return os.path.join(cache_dir, "matrix.npy"), os.path.join(cache_dir, "meta.json")
+
+def read_meta(cache_dir: str = CACHE_DIR) -> Optional[Dict]:
+    _, meta_path = _paths(cache_dir)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+def _write_meta(cache_dir: str, meta: Dict):
+    _, meta_path = _paths(cache_dir)
+    tmp = meta_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+
+def _header(rows: int) -> bytes:
+    buf = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        buf, {"descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)), "fortran_order": False,
+              "shape": (rows, len(COLUMNS))})
+    return buf.getvalue()
+
+def _data_offset(matrix_path: str) -> int:
+    with open(matrix_path, "rb") as f:
+        np.lib.format.read_magic(f)
+        np.lib.format.read_array_header_1_0(f)
+        return f.tell()
+
+def _append(matrix_path: str, rows: int, chunk: np.ndarray) -> int:
+    """Write `chunk` after the first `rows` rows and fix up the .npy header; returns the new row count."""
+    new_rows = rows + len(chunk)
+    header = _header(new_rows)
+    if not os.path.exists(matrix_path):
+        with open(matrix_path, "wb") as f:
+            f.write(header)
+            f.write(chunk.tobytes())
+        return new_rows
+    offset = _data_offset(matrix_path)
+    if len(header) != offset:
+        # the shape grew past the header's padding (rare); copy into a file with the larger header
+        tmp = matrix_path + ".tmp"
+        with open(matrix_path, "rb") as src, open(tmp, "wb") as dst:
+            dst.write(header)
+            src.seek(offset)
+            remaining = rows * len(COLUMNS) * 4
+            while remaining:
+                block = src.read(min(remaining, 1 << 24))
+                dst.write(block)
+                remaining -= len(block)
+            dst.write(chunk.tobytes())
+        os.replace(tmp, matrix_path)
+        return new_rows
+    with open(matrix_path, "r+b") as f:
+        f.seek(offset + rows * len(COLUMNS) * 4)
+        f.write(chunk.tobytes())
+        f.truncate()
+        f.seek(0)
+        f.write(header)
+    return new_rows
+
+# -------------------------------
+# Update / load
+# -------------------------------
+def update(db_path: str = DB_PATH, cache_dir: str = CACHE_DIR, chunk_rows: int = CHUNK_ROWS,
+           rebuild: bool = False) -> Dict[str, int]:
+    """Append score_rows newer than the cached last_id. Returns appended and total rows."""
+    started = time.time()
+    matrix_path, meta_path = _paths(cache_dir)
+    meta = None if rebuild else read_meta(cache_dir)
+    con = db.connect(db_path)
+    try:
+        max_id = con.execute("SELECT coalesce(max(id), 0) FROM score_rows").fetchone()[0]
+    finally:
+        con.close()
+    # a cache built from another database (or a recreated one) cannot be extended
+    if meta is not None and (meta.get("db") != os.path.abspath(db_path) or meta.get("columns") != COLUMNS
+                             or meta["last_id"] > max_id):
+        meta = None
+    if meta is None:
+        # only our own files: cache_dir is configurable and may hold anything else
+        for path in (matrix_path, meta_path, matrix_path + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+        meta = {"last_id": 0, "rows": 0, "columns": COLUMNS, "db": os.path.abspath(db_path)}
+    os.makedirs(cache_dir, exist_ok=True)
+
+    appended = 0
+    sql = f"SELECT id, {', '.join(COLUMNS)} FROM score_rows WHERE id > ? AND id <= ? ORDER BY id LIMIT ?"
+    while meta["last_id"] < max_id:
+        con = db.connect(db_path)
+        try:
+            rows = con.execute(sql, (meta["last_id"], max_id, chunk_rows)).fetchall()
+        finally:
+            con.close()
+        if not rows:
+            break
+        chunk = np.array(rows, dtype=np.float64)  # NULL -> NaN; ids stay exact before the float32 cast
+        meta["rows"] = _append(matrix_path, meta["rows"], np.ascontiguousarray(chunk[:, 1:], dtype=np.float32))
+        meta["last_id"] = int(chunk[-1, 0])
+        _write_meta(cache_dir, meta)
+        appended += len(rows)
+
+    metrics.observe("feature_cache_update", time.time() - started)
+    return {"appended": appended, "rows": meta["rows"], "last_id": meta["last_id"]}
+
+def load(cache_dir: str = CACHE_DIR) -> Tuple[np.ndarray, np.ndarray]:
+    """(X, y) as read-only memory-mapped float32 views of the cache."""
+    meta = read_meta(cache_dir)
+    if meta is None or not meta["rows"]:
+        empty = np.empty((0, len(COLUMNS)), dtype=np.float32)
+        return empty[:, :-1], empty[:, -1]
+    matrix_path, _ = _paths(cache_dir)
+    data = np.load(matrix_path, mmap_mode="r")[:meta["rows"]]
+    return data[:, :-1], data[:, -1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--rebuild", action="store_true", help="drop the cache and read every row again")
+    args = parser.parse_args()
+
+    score_store.ensure_schema(args.db)
+    started = time.time()
+    stats = update(args.db, args.cache_dir, args.chunk_rows, args.rebuild)
+    print(f"✅ Appended {stats['appended']} rows in {time.time() - started:.1f}s; cache holds {stats['rows']} rows "
+          f"up to id {stats['last_id']} in {args.cache_dir}")
+
+if __name__ == "__main__":
+    main()
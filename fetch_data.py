@@ -5,6 +5,8 @@ import requests
 from textblob import TextBlob
 from dotenv import load_dotenv
 
+import metrics
+
 # Load .env if present
 load_dotenv()
 
@@ -18,7 +20,8 @@ def get_stock_data_yahoo(ticker: str) -> dict:
     """Fetch daily change, PE, debt-to-equity from Yahoo Finance."""
     try:
         stock = yf.Ticker(ticker)
-        hist = stock.history(period="5d")
+        with metrics.timed("yahoo_history"):
+            hist = stock.history(period="5d")
 
         if len(hist) < 2:
             return {
@@ -33,7 +36,8 @@ def get_stock_data_yahoo(ticker: str) -> dict:
         prev_close = float(hist["Close"].iloc[-2])
         change_1d = ((close_price - prev_close) / prev_close) * 100.0
 
-        info = stock.info or {}
+        with metrics.timed("yahoo_info"):
+            info = stock.info or {}
         pe_ratio = float(info.get("forwardPE") or 0.0)
         debt_to_equity = float(info.get("debtToEquity") or 0.0)
 
@@ -62,11 +66,13 @@ def get_stock_data_alpha(ticker: str) -> dict:
     try:
         url = "https://www.alphavantage.co/query"
         params = {"function": "OVERVIEW", "symbol": ticker, "apikey": ALPHA_VANTAGE_KEY}
-        resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
-        data = resp.json()
+        with metrics.timed("alpha_vantage"):
+            resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+            data = resp.json()
 
         # Common AV errors / rate limits
         if not isinstance(data, dict) or ("Symbol" not in data and "Note" in data):
+            metrics.record_error("alpha_vantage")
             return {"market_cap": 0.0, "eps": 0.0, "book_value": 0.0, "error": data.get("Note", "Alpha Vantage returned no data")}
 
         market_cap = float(data.get("MarketCapitalization", 0) or 0)
@@ -97,16 +103,19 @@ def get_news_sentiment(query: str) -> dict:
             "pageSize": 10,
             "apiKey": NEWS_API_KEY,
         }
-        resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
-        data = resp.json()
+        with metrics.timed("newsapi"):
+            resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+            data = resp.json()
 
         if "articles" not in data:
+            metrics.record_error("newsapi")
             return {"headlines": [], "sentiment": 0.0, "error": data.get("message", "NewsAPI returned no articles")}
 
         headlines = [a.get("title", "").strip() for a in data["articles"] if a.get("title")]
         headlines = [h for h in headlines if h]  # non-empty only
 
-        sentiments = [TextBlob(h).sentiment.polarity for h in headlines]
+        with metrics.timed("textblob"):
+            sentiments = [TextBlob(h).sentiment.polarity for h in headlines]
         avg = round(sum(sentiments) / len(sentiments), 2) if sentiments else 0.0
 
         return {"headlines": headlines[:10], "sentiment": avg, "error": None}
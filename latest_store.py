@@ -0,0 +1,95 @@
+# latest_store.py
+import json
+import threading
+from datetime import datetime
+from typing import Dict, Any, Tuple
+
+import db
+import metrics
+
+DB_PATH = "scores.db"
+
+# One row per tracked ticker with its pre-serialized /latest entry, plus a
+# single version counter bumped on every write. All gunicorn workers share it.
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS latest_scores (
+  ticker TEXT PRIMARY KEY,
+  payload TEXT NOT NULL,
+  updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS latest_version (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO latest_version (id, version) VALUES (1, 0);
+"""
+
+# Per-process copy of the last assembled body, keyed by version
+_body_cache = {"version": None, "body": None}
+_body_lock = threading.Lock()
+
+def ensure_schema(db_path: str = DB_PATH):
+    con = db.connect(db_path)
+    try:
+        cur = con.cursor()
+        for stmt in SCHEMA_SQL.strip().split(";"):
+            s = stmt.strip()
+            if s:
+                cur.execute(s)
+        con.commit()
+    finally:
+        con.close()
+
+def put_latest(entries: Dict[str, Dict[str, Any]], db_path: str = DB_PATH) -> int:
+    """Upsert the latest entry for each ticker and bump the version once. Returns the new version."""
+    now = datetime.utcnow().isoformat()
+    rows = [(ticker, json.dumps(entry, default=str), now) for ticker, entry in entries.items()]
+    con = db.connect(db_path)
+    try:
+        cur = con.cursor()
+        cur.executemany(
+            """
+            INSERT INTO latest_scores (ticker, payload, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(ticker) DO UPDATE SET payload = excluded.payload, updated_at = excluded.updated_at
+            """,
+            rows,
+        )
+        cur.execute("UPDATE latest_version SET version = version + 1 WHERE id = 1")
+        cur.execute("SELECT version FROM latest_version WHERE id = 1")
+        version = cur.fetchone()[0]
+        con.commit()
+        return version
+    finally:
+        con.close()
+
+def get_version(db_path: str = DB_PATH) -> int:
+    con = db.connect(db_path)
+    try:
+        row = con.execute("SELECT version FROM latest_version WHERE id = 1").fetchone()
+        return row[0] if row else 0
+    finally:
+        con.close()
+
+def get_latest_body(db_path: str = DB_PATH) -> Tuple[int, str]:
+    """Return (version, JSON body) for /latest, rebuilding only when the version moved."""
+    con = db.connect(db_path, isolation_level=None)
+    try:
+        # read version and rows from one snapshot so they always agree
+        con.execute("BEGIN")
+        version = con.execute("SELECT version FROM latest_version WHERE id = 1").fetchone()[0]
+        with _body_lock:
+            if _body_cache["version"] == version:
+                metrics.cache_hit("latest_body")
+                return version, _body_cache["body"]
+        metrics.cache_miss("latest_body")
+        rows = con.execute("SELECT ticker, payload FROM latest_scores ORDER BY ticker").fetchall()
+        con.execute("COMMIT")
+    finally:
+        con.close()
+
+    # payloads are already JSON, so the body is stitched together without re-encoding
+    body = "{" + ",".join(f"{json.dumps(ticker)}:{payload}" for ticker, payload in rows) + "}"
+    with _body_lock:
+        _body_cache["version"] = version
+        _body_cache["body"] = body
+    return version, body
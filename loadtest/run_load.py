@@ -0,0 +1,287 @@
+# loadtest/run_load.py
+"""End-to-end load test of /predict, /latest and /history against stub providers.
+
+Run from the repo root:
+    python loadtest/run_load.py --duration 60 --concurrency 16 --mix predict=2,latest=6,history=2
+    python loadtest/run_load.py --output reports/$(git rev-parse --short HEAD).json --compare reports/base.json
+
+Starts loadtest.stub_app under gunicorn (or the Flask dev server when gunicorn is not
+available) in a scratch directory, so the repo's scores.db is never touched.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, weight = part.split("=")
+        if name not in ("predict", "latest", "history"):
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}")
+        mix[name] = float(weight)
+    return mix
+
+# -------------------------------
+# Server
+# -------------------------------
+def start_server(args, workdir: str, port: int):
+    # model.py and app.py load the pickled model relative to the working directory
+    for rel in ("ml_model.pkl", os.path.join("backend", "ml_model.pkl")):
+        src = os.path.join(ROOT, rel)
+        if os.path.exists(src):
+            os.makedirs(os.path.dirname(os.path.join(workdir, rel)) or workdir, exist_ok=True)
+            os.symlink(src, os.path.join(workdir, rel))
+
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        STUB_LATENCY_MS=str(args.stub_latency_ms),
+        STUB_JITTER_MS=str(args.stub_jitter_ms),
+        STUB_ERROR_RATE=str(args.stub_error_rate),
+        TRACKED_TICKERS=",".join(universe(args.universe_size)[:args.tracked]),
+    )
+    use_gunicorn = not args.dev_server and shutil.which("gunicorn") is not None
+    if use_gunicorn:
+        cmd = ["gunicorn", "loadtest.stub_app:app", "--bind", f"127.0.0.1:{port}",
+               "--workers", str(args.workers), "--threads", str(args.threads), "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-c",
+               f"from loadtest.stub_app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    log = open(os.path.join(workdir, "server.log"), "w")
+    proc = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return proc, ("gunicorn" if use_gunicorn else "flask-dev")
+
+def wait_ready(base_url: str, proc, timeout: float = 120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError("server exited during startup; see server.log")
+        try:
+            urllib.request.urlopen(base_url + "/latest", timeout=2).read()
+            return
+        except Exception:
+            time.sleep(0.5)
+    raise RuntimeError(f"server not ready after {timeout}s")
+
+def stop_server(proc):
+    if proc is None or proc.poll() is not None:
+        return
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+# -------------------------------
+# Load generation
+# -------------------------------
+def universe(size: int):
+    return [f"SYN{i:05d}" for i in range(size)]
+
+def percentile(sorted_values, q: float):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+class Driver:
+    def __init__(self, base_url: str, args):
+        self.base_url = base_url
+        self.args = args
+        self.tickers = universe(args.universe_size)
+        self.endpoints = list(args.mix)
+        self.weights = [args.mix[e] for e in self.endpoints]
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.not_modified = 0
+        self.ticker_errors = 0
+        self.lock = threading.Lock()
+
+    def request(self, rng: random.Random, endpoint: str, etag_box: dict):
+        headers = {}
+        data = None
+        if endpoint == "predict":
+            tickers = rng.sample(self.tickers, min(self.args.tickers_per_request, len(self.tickers)))
+            url = self.base_url + "/predict"
+            data = json.dumps({"tickers": tickers}).encode()
+            headers["Content-Type"] = "application/json"
+        elif endpoint == "latest":
+            url = self.base_url + "/latest"
+            # behave like a polling dashboard that remembers the last ETag
+            if etag_box.get("etag"):
+                headers["If-None-Match"] = etag_box["etag"]
+        else:
+            url = f"{self.base_url}/history/{rng.choice(self.tickers)}?fields=scores&limit=100"
+
+        req = urllib.request.Request(url, data=data, headers=headers)
+        start = time.perf_counter()
+        status, body, etag = None, b"", None
+        try:
+            with urllib.request.urlopen(req, timeout=self.args.timeout) as resp:
+                status, body, etag = resp.status, resp.read(), resp.headers.get("ETag")
+        except urllib.error.HTTPError as e:
+            status = e.code
+            etag = e.headers.get("ETag")
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            if status == 304:
+                self.not_modified += 1
+            elif status is None or status >= 400:
+                self.errors[endpoint] += 1
+            elif endpoint == "predict":
+                self.ticker_errors += sum(1 for r in json.loads(body).get("results", []) if r.get("error"))
+        if etag:
+            etag_box["etag"] = etag
+
+    def worker(self, seed: int, stop_at: float):
+        rng = random.Random(seed)
+        etag_box = {}
+        while time.time() < stop_at:
+            self.request(rng, rng.choices(self.endpoints, self.weights)[0], etag_box)
+
+    def run(self):
+        stop_at = time.time() + self.args.duration
+        threads = [threading.Thread(target=self.worker, args=(i, stop_at), daemon=True)
+                   for i in range(self.args.concurrency)]
+        started = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.time() - started
+
+def build_report(driver: Driver, wall_s: float, args, server_kind: str) -> dict:
+    endpoints = {}
+    total = 0
+    for endpoint, values in sorted(driver.latencies.items()):
+        values = sorted(values)
+        total += len(values)
+        endpoints[endpoint] = {
+            "requests": len(values),
+            "throughput_rps": round(len(values) / wall_s, 2),
+            "error_rate": round(driver.errors[endpoint] / len(values), 4) if values else 0.0,
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+        }
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "server": server_kind,
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "wall_s": round(wall_s, 2),
+        "total_requests": total,
+        "throughput_rps": round(total / wall_s, 2),
+        "error_rate": round(sum(driver.errors.values()) / total, 4) if total else 0.0,
+        "latest_304": driver.not_modified,
+        "predict_ticker_errors": driver.ticker_errors,
+        "endpoints": endpoints,
+    }
+
+def print_report(report: dict, baseline=None):
+    print(f"\n📊 {report['server']} @ {report['commit']}: {report['total_requests']} requests in "
+          f"{report['wall_s']}s → {report['throughput_rps']} req/s, error rate {report['error_rate']:.2%}")
+    print(f"{'endpoint':<10} {'reqs':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err':>7}")
+    for name, e in report["endpoints"].items():
+        line = (f"{name:<10} {e['requests']:>7} {e['throughput_rps']:>8} {e['p50_ms']:>9} "
+                f"{e['p95_ms']:>9} {e['p99_ms']:>9} {e['error_rate']:>7.2%}")
+        base = (baseline or {}).get("endpoints", {}).get(name)
+        if base:
+            line += (f"   vs {baseline['commit']}: p95 {e['p95_ms'] / base['p95_ms']:.2f}x, "
+                     f"rps {e['throughput_rps'] / base['throughput_rps']:.2f}x")
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="drive an already running server instead of starting one")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("predict=2,latest=6,history=2"),
+                        help="relative weights, e.g. predict=2,latest=6,history=2")
+    parser.add_argument("--tickers-per-request", type=int, default=5)
+    parser.add_argument("--universe-size", type=int, default=200)
+    parser.add_argument("--tracked", type=int, default=20, help="tickers the server's scheduler refreshes")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--dev-server", action="store_true", help="use the Flask dev server even if gunicorn exists")
+    parser.add_argument("--stub-latency-ms", type=float, default=50)
+    parser.add_argument("--stub-jitter-ms", type=float, default=20)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--warmup", type=int, default=3, help="untimed /predict calls before measuring")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    proc, workdir = None, None
+    try:
+        if args.url:
+            base_url, server_kind = args.url.rstrip("/"), "external"
+        else:
+            workdir = tempfile.mkdtemp(prefix="credtech-load-")
+            port = free_port()
+            proc, server_kind = start_server(args, workdir, port)
+            base_url = f"http://127.0.0.1:{port}"
+            print(f"🚀 Starting {server_kind} in {workdir} ...")
+        wait_ready(base_url, proc)
+
+        driver = Driver(base_url, args)
+        warm_rng = random.Random(0)
+        for _ in range(args.warmup):
+            driver.request(warm_rng, "predict", {})
+        driver.latencies.clear()
+        driver.errors.clear()
+        driver.ticker_errors = 0
+
+        print(f"⏱️  {args.duration}s at concurrency {args.concurrency}, mix {args.mix}")
+        wall_s = driver.run()
+        report = build_report(driver, wall_s, args, server_kind)
+    finally:
+        stop_server(proc)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\n📦 Report written to {args.output}")
+    if workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# loadtest/stub_app.py
+"""The Flask app with network providers replaced by local stubs, for load testing.
+
+Serve with:  gunicorn loadtest.stub_app:app
+Stub behavior comes from the environment:
+    STUB_LATENCY_MS    mean latency of each provider call (default 50)
+    STUB_JITTER_MS     uniform +/- jitter around that mean (default 20)
+    STUB_ERROR_RATE    probability a provider call fails (default 0.0)
+"""
+import os
+import random
+import time
+
+import build_features as build_features_module
+
+LATENCY_S = float(os.environ.get("STUB_LATENCY_MS", 50)) / 1000
+JITTER_S = float(os.environ.get("STUB_JITTER_MS", 20)) / 1000
+ERROR_RATE = float(os.environ.get("STUB_ERROR_RATE", 0.0))
+
+HEADLINES = [
+    "{t} announces record profit in third quarter",
+    "{t} faces lawsuit over product safety",
+    "Analysts upgrade {t} after strong guidance",
+    "{t} shares slip as market waits on rate decision",
+    "{t} signs partnership with European supplier",
+]
+
+def _call(provider: str):
+    time.sleep(max(0.0, LATENCY_S + random.uniform(-JITTER_S, JITTER_S)))
+    if random.random() < ERROR_RATE:
+        raise RuntimeError(f"stub {provider} error")
+
+def _ticker_rng(ticker: str) -> random.Random:
+    # per-ticker fundamentals stay stable; only the daily move varies between calls
+    return random.Random(ticker)
+
+def stub_yahoo(ticker: str) -> dict:
+    _call("yahoo")
+    rng = _ticker_rng(ticker)
+    return {
+        "close_price": round(rng.uniform(5, 500), 2),
+        "change_1d": round(random.gauss(0, 2.5), 2),
+        "pe_ratio": max(rng.gauss(25, 15), 0.0),
+        "debt_to_equity": max(rng.gauss(120, 80), 0.0),
+        "error": None,
+    }
+
+def stub_alpha(ticker: str) -> dict:
+    _call("alpha")
+    rng = _ticker_rng(ticker)
+    return {"market_cap": 10 ** rng.uniform(9, 12.5), "eps": rng.gauss(3, 4),
+            "book_value": rng.gauss(20, 15), "error": None}
+
+def stub_news(ticker: str) -> dict:
+    _call("news")
+    return {"headlines": [h.format(t=ticker) for h in HEADLINES], "sentiment": round(random.gauss(0.05, 0.2), 2),
+            "error": None}
+
+build_features_module.get_stock_data_yahoo = stub_yahoo
+build_features_module.get_stock_data_alpha = stub_alpha
+build_features_module.get_news_sentiment = stub_news
+
+from app import app  # noqa: E402  (import after patching so every worker uses the stubs)
@@ -0,0 +1,106 @@
+# metrics.py
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PREFIX = "credtech"
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+# Process-local registry. Under gunicorn each worker reports its own numbers,
+# and scheduler series only appear on the worker holding the refresh lease.
+_lock = threading.Lock()
+_latency = defaultdict(Histogram)
+_errors = defaultdict(int)
+_cache = defaultdict(lambda: {"hit": 0, "miss": 0})
+_gauges = {}
+
+def observe(stage: str, seconds: float):
+    with _lock:
+        _latency[stage].observe(seconds)
+
+def record_error(stage: str):
+    with _lock:
+        _errors[stage] += 1
+
+@contextmanager
+def timed(stage: str):
+    """Time the block into the stage's latency histogram; an exception also counts as a stage error."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        record_error(stage)
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+def cache_hit(stage: str):
+    with _lock:
+        _cache[stage]["hit"] += 1
+
+def cache_miss(stage: str):
+    with _lock:
+        _cache[stage]["miss"] += 1
+
+def set_gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        latency = {stage: (list(h.counts), h.total, h.count, h.buckets) for stage, h in _latency.items()}
+        errors = dict(_errors)
+        cache = {stage: dict(c) for stage, c in _cache.items()}
+        gauges = dict(_gauges)
+
+    lines = [
+        f"# HELP {PREFIX}_stage_latency_seconds Latency of each pipeline stage.",
+        f"# TYPE {PREFIX}_stage_latency_seconds histogram",
+    ]
+    for stage in sorted(latency):
+        counts, total, count, buckets = latency[stage]
+        cumulative = 0
+        for bound, n in zip(buckets, counts):
+            cumulative += n
+            lines.append(f'{PREFIX}_stage_latency_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'{PREFIX}_stage_latency_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        lines.append(f'{PREFIX}_stage_latency_seconds_sum{{stage="{stage}"}} {total}')
+        lines.append(f'{PREFIX}_stage_latency_seconds_count{{stage="{stage}"}} {count}')
+
+    lines += [
+        f"# HELP {PREFIX}_stage_errors_total Errors raised or reported by each stage.",
+        f"# TYPE {PREFIX}_stage_errors_total counter",
+    ]
+    for stage in sorted(errors):
+        lines.append(f'{PREFIX}_stage_errors_total{{stage="{stage}"}} {errors[stage]}')
+
+    lines += [
+        f"# HELP {PREFIX}_cache_requests_total Cache lookups by stage and result.",
+        f"# TYPE {PREFIX}_cache_requests_total counter",
+    ]
+    for stage in sorted(cache):
+        for result in ("hit", "miss"):
+            lines.append(f'{PREFIX}_cache_requests_total{{stage="{stage}",result="{result}"}} {cache[stage][result]}')
+
+    for name in sorted(gauges):
+        lines.append(f"# TYPE {PREFIX}_{name} gauge")
+        lines.append(f"{PREFIX}_{name} {gauges[name]}")
+
+    return "\n".join(lines) + "\n"
@@ -2,10 +2,12 @@
 import pickle
 import numpy as np
 import shap
-import sqlite3
 import spacy
 from textblob import TextBlob
 from build_features import build_features
+import explanations
+import metrics
+import score_store
 
 # -------------------------------
 # Globals
@@ -39,63 +41,51 @@ except OSError:
 # Rule-based score
 # -------------------------------
 def rule_based_score(features: dict):
+    """Return (score, rule hits); explanations.render() turns a hit into its sentence."""
     score = 70
-    explanation = []
+    hits = []
 
     # Stock movement
     if features["change_1d"] < -2:
-        explanation.append(f"Stock fell {features['change_1d']:.2f}% → -20 points")
-        score -= 20
+        hits.append(explanations.hit("stock_fell", features["change_1d"], -20))
     elif features["change_1d"] > 2:
-        explanation.append(f"Stock rose {features['change_1d']:.2f}% → +10 points")
-        score += 10
+        hits.append(explanations.hit("stock_rose", features["change_1d"], 10))
     else:
-        explanation.append(f"Stock change {features['change_1d']:.2f}% → no major effect")
+        hits.append(explanations.hit("stock_flat", features["change_1d"], 0))
 
     # Debt-to-equity
     if features["debt_to_equity"] > 200:
-        explanation.append(f"High debt ratio {features['debt_to_equity']:.2f} → -15 points")
-        score -= 15
+        hits.append(explanations.hit("high_debt", features["debt_to_equity"], -15))
     else:
-        explanation.append(f"Debt ratio {features['debt_to_equity']:.2f} is stable → no penalty")
+        hits.append(explanations.hit("debt_stable", features["debt_to_equity"], 0))
 
     # P/E ratio
     if features["pe_ratio"] > 30:
-        explanation.append(f"High P/E ratio {features['pe_ratio']:.2f} → -5 points")
-        score -= 5
+        hits.append(explanations.hit("high_pe", features["pe_ratio"], -5))
     elif features["pe_ratio"] > 0:
-        explanation.append(f"P/E ratio {features['pe_ratio']:.2f} is reasonable → +5 points")
-        score += 5
+        hits.append(explanations.hit("pe_reasonable", features["pe_ratio"], 5))
 
     # Market cap
     if features["market_cap"] > 1e11:
-        explanation.append("Large market cap company → +5 points")
-        score += 5
+        hits.append(explanations.hit("large_cap", features["market_cap"], 5))
     elif features["market_cap"] > 0:
-        explanation.append("Smaller market cap company → -5 points")
-        score -= 5
+        hits.append(explanations.hit("small_cap", features["market_cap"], -5))
 
     # EPS
     if features["eps"] > 0:
-        explanation.append(f"Profitable with EPS {features['eps']} → +5 points")
-        score += 5
+        hits.append(explanations.hit("profitable", features["eps"], 5))
     else:
-        explanation.append("No EPS data or negative → -5 points")
-        score -= 5
+        hits.append(explanations.hit("no_eps", features["eps"], -5))
 
     # Book value
     if features["book_value"] > 0:
-        explanation.append(f"Positive book value {features['book_value']} → +3 points")
-        score += 3
+        hits.append(explanations.hit("book_value", features["book_value"], 3))
 
     # News sentiment
-    sentiment_effect = int(features["news_sentiment"] * 20)
-    explanation.append(
-        f"News sentiment {features['news_sentiment']:.2f} → {sentiment_effect:+} points"
-    )
-    score += sentiment_effect
+    hits.append(explanations.hit("news_sentiment", features["news_sentiment"], int(features["news_sentiment"] * 20)))
 
-    return max(min(score, 100), 0), explanation
+    score += sum(h.delta for h in hits)
+    return max(min(score, 100), 0), hits
 
 
 # -------------------------------
@@ -110,12 +100,14 @@ def detect_events(headlines):
         entry = {"headline": h, "entities": [], "sentiment": 0, "impact": "neutral"}
 
         # sentiment
-        s = TextBlob(h).sentiment.polarity
+        with metrics.timed("textblob"):
+            s = TextBlob(h).sentiment.polarity
         entry["sentiment"] = s
 
         # entity recognition
         if nlp:
-            doc = nlp(h)
+            with metrics.timed("spacy"):
+                doc = nlp(h)
             entry["entities"] = [(ent.text, ent.label_) for ent in doc.ents]
 
         # classify impact
@@ -134,16 +126,7 @@ def detect_events(headlines):
 # Trend analysis (only from scores table)
 # -------------------------------
 def get_score_trend(ticker: str, days: int = 7):
-    con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
-    cur.execute("""
-        SELECT timestamp, final_score FROM scores
-        WHERE ticker = ?
-        ORDER BY timestamp DESC
-        LIMIT ?
-    """, (ticker, days))
-    rows = cur.fetchall()
-    con.close()
+    rows = score_store.latest_final_scores(ticker, days, db_path=DB_PATH)
 
     if not rows:
         return {"trend": "no data", "change": 0, "history": []}
@@ -171,7 +154,9 @@ def explain_score(features: dict):
     print(f"\n📊 Analyzing {ticker} ...")
 
     # Rule score
-    rule_score, explanation = rule_based_score(features)
+    with metrics.timed("rule_score"):
+        rule_score, rule_hits = rule_based_score(features)
+    explanation = explanations.render_all(rule_hits)
     print(f"📊 [ {ticker} ] Initial Rule-Based Score: {rule_score}")
     for e in explanation:
         print(f"   └ {e}")
@@ -185,13 +170,15 @@ def explain_score(features: dict):
                        features.get("eps", 0),
                        features.get("book_value", 0),
                        features.get("news_sentiment", 0)]])
-        ml_score = ml_model.predict(X)[0]
+        with metrics.timed("rf_predict"):
+            ml_score = ml_model.predict(X)[0]
         ml_score = max(min(float(ml_score), 100), 0)
         print(f"\n🤖 ML Model Score: {ml_score:.2f}")
 
         # SHAP explanations
-        explainer = shap.TreeExplainer(ml_model)
-        shap_vals = explainer.shap_values(X)
+        with metrics.timed("shap"):
+            explainer = shap.TreeExplainer(ml_model)
+            shap_vals = explainer.shap_values(X)
         shap_values = dict(zip(
             ["change_1d", "debt_to_equity", "pe_ratio", "market_cap",
              "eps", "book_value", "news_sentiment"],
@@ -224,6 +211,7 @@ def explain_score(features: dict):
         "ml_score": ml_score,
         "final_score": final_score,
         "explanation": explanation,
+        "rule_hits": rule_hits,
         "ml_feature_importance": shap_values,
         "events": events
     }
@@ -0,0 +1,215 @@
+# model_search.py
+"""Parallel hyperparameter search for the ML score model, under a single-row latency budget.
+
+explain_score() predicts (and SHAP-explains) one ticker at a time, so the model that
+ships is the most accurate candidate whose single-row predict stays within
+MODEL_LATENCY_BUDGET_MS, not simply the most accurate one.
+
+Candidates are fitted in a process pool. The feature matrix is written once as .npy
+files and every worker memory-maps them, so the data is not copied per process.
+
+    python model_search.py --db synthetic.db --sample 200000
+    python model_search.py --budget-ms 2 --workers 4 --report search.json
+    python train_model.py --search                      # same, from the training CLI
+"""
+import argparse
+import json
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.tree import DecisionTreeRegressor
+
+import parquet_export
+import train_model
+
+MODEL_LATENCY_BUDGET_MS = float(os.environ.get("MODEL_LATENCY_BUDGET_MS", 10))
+SEARCH_WORKERS = int(os.environ.get("SEARCH_WORKERS", os.cpu_count() or 1))
+# single-row predictions timed per candidate
+LATENCY_SAMPLES = int(os.environ.get("SEARCH_LATENCY_SAMPLES", 200))
+REPORT_PATH = "model_search_report.json"
+TEST_SIZE = 0.2
+
+ESTIMATORS = {
+    "rf": RandomForestRegressor,
+    "hgb": HistGradientBoostingRegressor,
+    "tree": DecisionTreeRegressor,
+}
+
+# (estimator, params); every candidate is seeded so the winner can be refitted identically
+CANDIDATES = (
+    [("rf", {"n_estimators": n, "max_depth": d, "min_samples_leaf": 2})
+     for n in (25, 50, 100, 200) for d in (None, 12)]
+    + [("hgb", {"max_iter": n, "learning_rate": lr, "max_leaf_nodes": 31})
+       for n in (100, 300) for lr in (0.05, 0.1)]
+    + [("tree", {"max_depth": d}) for d in (4, 6, 8, 12)]
+)
+
+def build(name: str, params: Dict, n_jobs: int = 1):
+    params = dict(params, random_state=train_model.SEED)
+    if name == "rf":
+        params["n_jobs"] = n_jobs
+    return ESTIMATORS[name](**params)
+
+def latency_ms(model, X, samples: int = LATENCY_SAMPLES) -> Dict[str, float]:
+    """p50/p95 of predict() on one row at a time, the way explain_score calls it."""
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = 1  # a thread pool per single-row predict only adds overhead
+    rows = X[:samples]
+    model.predict(rows[:1])  # warm-up
+    timings = []
+    for i in range(len(rows)):
+        start = time.perf_counter()
+        model.predict(rows[i:i + 1])
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {"p50_ms": timings[len(timings) // 2], "p95_ms": timings[int(len(timings) * 0.95)]}
+
+def explainable(model) -> bool:
+    """explain_score runs shap.TreeExplainer on the model, so candidates it rejects cannot ship."""
+    try:
+        import shap
+        shap.TreeExplainer(model)
+        return True
+    except Exception:
+        return False
+
+# -------------------------------
+# Workers
+# -------------------------------
+_data = {}
+
+def _attach(data_dir: str):
+    # read-only memory maps: the page cache is shared by every worker
+    for key in ("X", "y"):
+        _data[key] = np.load(os.path.join(data_dir, f"{key}.npy"), mmap_mode="r")
+
+def _split(n: int):
+    cut = n - max(1, int(n * TEST_SIZE))
+    return slice(0, cut), slice(cut, n)
+
+def _evaluate(name: str, params: Dict) -> Dict:
+    X, y = _data["X"], _data["y"]
+    train, test = _split(len(X))
+    model = build(name, params)
+    start = time.perf_counter()
+    model.fit(X[train], y[train])
+    fit_s = time.perf_counter() - start
+    preds = model.predict(X[test])
+    return {
+        "estimator": name, "params": params, "fit_s": fit_s,
+        "r2": float(r2_score(y[test], preds)),
+        "rmse": float(np.sqrt(mean_squared_error(y[test], preds))),
+        "model_bytes": len(pickle.dumps(model)),
+        "explainable": explainable(model),
+        **latency_ms(model, np.ascontiguousarray(X[test])),
+    }
+
+# -------------------------------
+# Search
+# -------------------------------
+def search(X, y, budget_ms: float = MODEL_LATENCY_BUDGET_MS, workers: int = SEARCH_WORKERS,
+           candidates=CANDIDATES, model_path: Optional[str] = train_model.MODEL_PATH,
+           report_path: Optional[str] = REPORT_PATH) -> Dict:
+    """Fit every candidate in parallel, save the best one within budget and return the report.
+
+    report["chosen"] is None (and nothing is saved) when no candidate meets the budget.
+    """
+    # shuffle once so every worker's train/test split is a contiguous slice of the memory map
+    order = np.random.default_rng(train_model.SEED).permutation(len(X))
+    results: List[Dict] = []
+    started = time.time()
+    with tempfile.TemporaryDirectory(prefix="model_search_") as data_dir:
+        np.save(os.path.join(data_dir, "X.npy"), np.ascontiguousarray(X[order], dtype=np.float32))
+        np.save(os.path.join(data_dir, "y.npy"), np.ascontiguousarray(y[order], dtype=np.float32))
+        _attach(data_dir)
+        with ProcessPoolExecutor(max_workers=max(1, workers), initializer=_attach, initargs=(data_dir,)) as pool:
+            futures = [pool.submit(_evaluate, name, params) for name, params in candidates]
+            for fut in as_completed(futures):
+                r = fut.result()
+                results.append(r)
+                print(f"   └ {r['estimator']:<4} {json.dumps(r['params'])}: R²={r['r2']:.3f} "
+                      f"p95={r['p95_ms']:.2f}ms fit={r['fit_s']:.1f}s")
+
+        results.sort(key=lambda r: r["rmse"])
+        # latencies measured next to busy workers run high; the chosen model is re-timed alone
+        chosen, model = None, None
+        for r in results:
+            r["within_budget"] = r["p95_ms"] <= budget_ms and r["explainable"]
+            if chosen is not None or not r["within_budget"]:
+                continue
+            X_all, y_all = _data["X"], _data["y"]
+            train, test = _split(len(X_all))
+            model = build(r["estimator"], r["params"], n_jobs=-1)
+            model.fit(X_all[train], y_all[train])
+            r.update(latency_ms(model, np.ascontiguousarray(X_all[test])))
+            r["within_budget"] = r["p95_ms"] <= budget_ms
+            if r["within_budget"]:
+                chosen = r
+        _data.clear()
+
+    report = {
+        "rows": int(len(X)), "budget_ms": budget_ms, "workers": workers,
+        "elapsed_s": time.time() - started,
+        "chosen": None if chosen is None else {k: chosen[k] for k in ("estimator", "params", "r2", "rmse", "p95_ms")},
+        "candidates": results,
+    }
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+    if chosen is not None and model_path:
+        with open(model_path, "wb") as f:
+            pickle.dump(model, f)
+    return report
+
+def print_report(report: Dict):
+    print(f"\n{'estimator':<9} {'params':<58} {'R²':>6} {'RMSE':>7} {'p50 ms':>7} {'p95 ms':>7} {'fit s':>6} {'KB':>7}")
+    chosen = report["chosen"] or {}
+    for r in report["candidates"]:
+        mark = "  " if r["within_budget"] else "⏱ "
+        if (r["estimator"], r["params"]) == (chosen.get("estimator"), chosen.get("params")):
+            mark = "🏆"
+        print(f"{mark}{r['estimator']:<7} {json.dumps(r['params']):<58} {r['r2']:>6.3f} {r['rmse']:>7.2f} "
+              f"{r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f} {r['fit_s']:>6.1f} {r['model_bytes'] / 1024:>7.0f}")
+
+def run(db_path=train_model.DB_PATH, model_path=train_model.MODEL_PATH, export_dir=parquet_export.EXPORT_DIR,
+        since=None, sample=train_model.TRAIN_SAMPLE_ROWS, budget_ms=MODEL_LATENCY_BUDGET_MS,
+        workers=SEARCH_WORKERS, report_path=REPORT_PATH):
+    X, y = train_model.load_arrays(db_path, export_dir, since, sample)
+    if len(X) < 20:
+        raise ValueError(f"❌ Not enough rows in DB to train model. Have {len(X)}, need at least 20.")
+    print(f"🔎 Searching {len(CANDIDATES)} candidates on {len(X)} rows with {workers} workers "
+          f"(budget {budget_ms}ms per row) ...")
+    report = search(X, y, budget_ms, workers, model_path=model_path, report_path=report_path)
+    print_report(report)
+    c = report["chosen"]
+    if c is None:
+        raise ValueError(f"❌ No candidate predicts within {budget_ms}ms per row; see {report_path}.")
+    print(f"\n✅ Best within budget: {c['estimator']} {json.dumps(c['params'])} R²={c['r2']:.3f}, "
+          f"p95={c['p95_ms']:.2f}ms")
+    print(f"📦 Model saved to {model_path}; report in {report_path}")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=train_model.DB_PATH)
+    parser.add_argument("--export-dir", default=parquet_export.EXPORT_DIR)
+    parser.add_argument("--since", type=datetime.fromisoformat)
+    parser.add_argument("--sample", type=int, default=train_model.TRAIN_SAMPLE_ROWS,
+                        help="search on a uniform sample of at most this many rows (0 = all)")
+    parser.add_argument("--budget-ms", type=float, default=MODEL_LATENCY_BUDGET_MS, help="p95 single-row predict budget")
+    parser.add_argument("--workers", type=int, default=SEARCH_WORKERS)
+    parser.add_argument("--model-out", default=train_model.MODEL_PATH)
+    parser.add_argument("--report", default=REPORT_PATH)
+    args = parser.parse_args()
+    run(args.db, args.model_out, args.export_dir, args.since, args.sample, args.budget_ms, args.workers, args.report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+# parquet_export.py
+"""Incremental Parquet export of score_rows for training and offline analysis.
+
+Rows are appended by id: every run exports only rows with id above the last exported
+id (kept in score_store_meta) into date-partitioned files
+
+    exports/score_rows/dt=2025-01-01/part-<first id>-<last id>.parquet
+
+so export cost grows with new rows, not with history, and the files outlive SQLite
+retention. Readers go through load_frame() (or iter_batches() for bounded memory), which
+prune columns and push ticker and time filters down to the partitions and row groups.
+
+    python parquet_export.py                 # export new rows, compact closed days
+    python parquet_export.py --db synthetic.db --export-dir /tmp/exports
+"""
+import argparse
+import fcntl
+import glob
+import os
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+import db
+import metrics
+import rollups
+import score_store
+
+DB_PATH = "scores.db"
+EXPORT_DIR = os.environ.get("PARQUET_EXPORT_DIR", os.path.join("exports", "score_rows"))
+EXPORT_BATCH = int(os.environ.get("PARQUET_EXPORT_BATCH", 100000))
+META_KEY = "parquet_export_last_id"
+
+COLUMNS = ["id", "ticker", "ts", "source"] + score_store.FEATURE_COLUMNS + score_store.SCORE_COLUMNS
+PART_RE = re.compile(r"part-(\d+)-(\d+)\.parquet$")
+
+def available() -> bool:
+    return pa is not None
+
+def _schema():
+    return pa.schema(
+        [("id", pa.int64()), ("ticker", pa.string()), ("ts", pa.timestamp("us")), ("source", pa.string())]
+        + [(c, pa.float64()) for c in score_store.FEATURE_COLUMNS + score_store.SCORE_COLUMNS]
+    )
+
+def _last_id(db_path: str) -> int:
+    con = db.connect(db_path)
+    try:
+        row = con.execute("SELECT value FROM score_store_meta WHERE key = ?", (META_KEY,)).fetchone()
+        return int(row[0]) if row else 0
+    finally:
+        con.close()
+
+def _set_last_id(db_path: str, last_id: int):
+    con = db.connect(db_path)
+    try:
+        con.execute("INSERT OR REPLACE INTO score_store_meta (key, value) VALUES (?, ?)", (META_KEY, str(last_id)))
+        con.commit()
+    finally:
+        con.close()
+
+def _parts(export_dir: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(export_dir, "dt=*", "part-*.parquet")))
+
+def _drop_orphans(export_dir: str, last_id: int):
+    """Remove files from a run that died before recording its watermark, so they are not duplicated."""
+    for path in _parts(export_dir):
+        m = PART_RE.search(path)
+        if m and int(m.group(1)) > last_id:
+            os.remove(path)
+
+def _drop_superseded(files: List[str]) -> List[str]:
+    """Delete files whose id range sits inside another file's (left over if a compaction was interrupted)."""
+    ranges = {f: tuple(map(int, PART_RE.search(f).groups())) for f in files}
+    keep = []
+    for f, (lo, hi) in ranges.items():
+        if any(g != f and g_lo <= lo and hi <= g_hi for g, (g_lo, g_hi) in ranges.items()):
+            os.remove(f)
+        else:
+            keep.append(f)
+    return keep
+
+def _write_partition(export_dir: str, day: str, table) -> str:
+    ids = table.column("id")
+    name = f"part-{ids[0].as_py()}-{ids[-1].as_py()}.parquet"
+    part_dir = os.path.join(export_dir, f"dt={day}")
+    os.makedirs(part_dir, exist_ok=True)
+    tmp = os.path.join(part_dir, "." + name + ".tmp")
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, os.path.join(part_dir, name))
+    return name
+
+# -------------------------------
+# Export
+# -------------------------------
+@contextmanager
+def _lock(export_dir: str):
+    """Exclusive lock on export_dir for the whole export, held across processes."""
+    os.makedirs(export_dir, exist_ok=True)
+    with open(os.path.join(export_dir, ".export.lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def export(db_path: str = DB_PATH, export_dir: str = EXPORT_DIR, batch_size: int = EXPORT_BATCH,
+           compact_closed: bool = True) -> Dict[str, int]:
+    """Append score_rows newer than the last exported id. Returns rows and files written."""
+    if not available():
+        raise RuntimeError("pyarrow is not installed; pip install pyarrow to export Parquet")
+    started = time.time()
+    # the hourly job and a training run may both export; the second waits, then sees the first's last_id
+    with _lock(export_dir):
+        last_id = _last_id(db_path)
+        _drop_orphans(export_dir, last_id)
+        stats = {"rows": 0, "files": 0, "compacted": 0}
+
+        while True:
+            con = db.connect(db_path)
+            try:
+                rows = con.execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM score_rows WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size),
+                ).fetchall()
+            finally:
+                con.close()
+            if not rows:
+                break
+
+            columns = list(zip(*rows))
+            arrays = [pa.array(col, type=field.type if field.name != "ts" else pa.string())
+                      for col, field in zip(columns, _schema())]
+            arrays[2] = arrays[2].cast(pa.timestamp("us"))
+            table = pa.Table.from_arrays(arrays, schema=_schema())
+
+            # one file per day touched by this batch; rows arrive in id order, which is close to time order
+            days = [ts[:10] for ts in columns[2]]
+            for day in sorted(set(days)):
+                mask = pa.array([d == day for d in days])
+                _write_partition(export_dir, day, table.filter(mask))
+                stats["files"] += 1
+
+            last_id = rows[-1][0]
+            _set_last_id(db_path, last_id)
+            stats["rows"] += len(rows)
+
+        if compact_closed:
+            stats["compacted"] = compact(export_dir)
+    metrics.observe("parquet_export", time.time() - started)
+    return stats
+
+def compact(export_dir: str = EXPORT_DIR, keep_open: Optional[str] = None) -> int:
+    """Merge the files of each closed day into one, so hourly exports do not pile up small files."""
+    today = keep_open or datetime.utcnow().strftime("%Y-%m-%d")
+    merged = 0
+    for part_dir in sorted(glob.glob(os.path.join(export_dir, "dt=*"))):
+        day = os.path.basename(part_dir)[3:]
+        files = sorted(_drop_superseded(glob.glob(os.path.join(part_dir, "part-*.parquet"))),
+                       key=lambda p: int(PART_RE.search(p).group(1)))
+        if day >= today or len(files) < 2:
+            continue
+        table = pa.concat_tables([pq.read_table(f, schema=_schema()) for f in files])
+        name = _write_partition(export_dir, day, table)
+        for f in files:
+            if os.path.basename(f) != name:
+                os.remove(f)
+        merged += len(files)
+    return merged
+
+# -------------------------------
+# Read
+# -------------------------------
+def _scan(since=None, until=None, tickers: Optional[Sequence[str]] = None, export_dir: str = EXPORT_DIR):
+    """(dataset, filter expression) for the exported rows matching the range and tickers."""
+    if not available():
+        raise RuntimeError("pyarrow is not installed; pip install pyarrow to read Parquet exports")
+    dataset = ds.dataset(export_dir, format="parquet", partitioning="hive", schema=_schema().append(
+        pa.field("dt", pa.string())))
+    expr = None
+    def add(e):
+        return e if expr is None else expr & e
+    if since is not None:
+        since = rollups.to_utc(since)
+        expr = add(ds.field("dt") >= since.strftime("%Y-%m-%d"))
+        expr = add(ds.field("ts") >= pa.scalar(since, pa.timestamp("us")))
+    if until is not None:
+        until = rollups.to_utc(until)
+        expr = add(ds.field("dt") <= until.strftime("%Y-%m-%d"))
+        expr = add(ds.field("ts") < pa.scalar(until, pa.timestamp("us")))
+    if tickers:
+        expr = add(ds.field("ticker").isin(list(tickers)))
+    return dataset, expr
+
+def load_frame(columns: Optional[Sequence[str]] = None, since=None, until=None,
+               tickers: Optional[Sequence[str]] = None, export_dir: str = EXPORT_DIR):
+    """Exported rows as a pandas DataFrame, reading only `columns` and the files/row groups that can match."""
+    if not available():
+        raise RuntimeError("pyarrow is not installed; pip install pyarrow to read Parquet exports")
+    if not _parts(export_dir):
+        return _schema().empty_table().select(list(columns or COLUMNS)).to_pandas()
+    dataset, expr = _scan(since, until, tickers, export_dir)
+    return dataset.to_table(columns=list(columns or COLUMNS), filter=expr).to_pandas()
+
+def count_rows(since=None, until=None, tickers: Optional[Sequence[str]] = None, export_dir: str = EXPORT_DIR) -> int:
+    """Number of exported rows in range; answered from Parquet metadata where the filter allows."""
+    if not _parts(export_dir):
+        return 0
+    dataset, expr = _scan(since, until, tickers, export_dir)
+    return dataset.count_rows(filter=expr)
+
+def iter_batches(columns: Sequence[str], since=None, until=None, tickers: Optional[Sequence[str]] = None,
+                 export_dir: str = EXPORT_DIR, batch_size: int = EXPORT_BATCH):
+    """Yield pyarrow RecordBatches of at most `batch_size` rows, so callers never hold the whole export."""
+    if not _parts(export_dir):
+        return
+    dataset, expr = _scan(since, until, tickers, export_dir)
+    yield from dataset.to_batches(columns=list(columns), filter=expr, batch_size=batch_size)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--export-dir", default=EXPORT_DIR)
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH)
+    parser.add_argument("--no-compact", action="store_true", help="leave closed days as several files")
+    args = parser.parse_args()
+
+    score_store.ensure_schema(args.db)
+    started = time.time()
+    stats = export(args.db, args.export_dir, args.batch_size, compact_closed=not args.no_compact)
+    print(f"✅ Exported {stats['rows']} new rows into {stats['files']} file(s) under {args.export_dir} "
+          f"in {time.time() - started:.1f}s; compacted {stats['compacted']} file(s).")
+
+if __name__ == "__main__":
+    main()
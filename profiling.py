@@ -0,0 +1,100 @@
+# profiling.py
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import threading
+import time
+import uuid
+from functools import wraps
+
+from flask import g, has_request_context, make_response, request
+
+# Comma-separated secrets allowed to trigger profiling; empty disables the hook entirely
+PROFILE_TOKENS = [t.strip() for t in os.environ.get("PROFILE_TOKENS", "").split(",") if t.strip()]
+# Optional comma-separated client addresses that may profile, on top of the token check
+PROFILE_ALLOWED_IPS = {ip.strip() for ip in os.environ.get("PROFILE_ALLOWED_IPS", "").split(",") if ip.strip()}
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_TOP_N = int(os.environ.get("PROFILE_TOP_N", 25))
+
+# cProfile is not re-entrant, so at most one profiled request runs per process
+_profile_lock = threading.Lock()
+
+def active() -> bool:
+    """True while the current request is being profiled."""
+    return has_request_context() and g.get("profiling", False)
+
+def _authorized(token: str) -> bool:
+    if PROFILE_ALLOWED_IPS and request.remote_addr not in PROFILE_ALLOWED_IPS:
+        return False
+    return any(hmac.compare_digest(token, allowed) for allowed in PROFILE_TOKENS)
+
+def summarize(profiler: cProfile.Profile, top_n: int = PROFILE_TOP_N):
+    """Top-N functions by cumulative time."""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({name})",
+            "ncalls": ncalls,
+            "tottime": round(tottime, 6),
+            "cumtime": round(cumtime, 6),
+        })
+    rows.sort(key=lambda r: r["cumtime"], reverse=True)
+    return rows[:top_n]
+
+def _save(profile_id: str, profiler: cProfile.Profile, elapsed: float):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, profile_id)
+    profiler.dump_stats(base + ".prof")
+    with open(base + ".txt", "w") as f:
+        f.write(f"{request.method} {request.full_path} took {elapsed:.3f}s\n")
+        pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+
+def profiled(view):
+    """Run the view under cProfile when an allowlisted X-Profile header or ?profile= token is sent.
+
+    The .prof dump and a text summary go to PROFILE_DIR/<id>; the id is returned in
+    X-Profile-Id and, for JSON object responses, a top-N summary is added under "profile".
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not PROFILE_TOKENS:
+            return view(*args, **kwargs)
+        token = request.headers.get("X-Profile") or request.args.get("profile")
+        if not token:
+            return view(*args, **kwargs)
+        if not _authorized(token):
+            return make_response({"error": "Profiling not allowed"}, 403)
+        if not _profile_lock.acquire(blocking=False):
+            response = make_response(view(*args, **kwargs))
+            response.headers["X-Profile-Skipped"] = "another request is being profiled"
+            return response
+
+        try:
+            g.profiling = True
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                rv = view(*args, **kwargs)
+            finally:
+                profiler.disable()
+                g.profiling = False
+            elapsed = time.perf_counter() - start
+
+            profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+            _save(profile_id, profiler, elapsed)
+            response = make_response(rv)
+            response.headers["X-Profile-Id"] = profile_id
+
+            body = response.get_json(silent=True) if response.is_json else None
+            if isinstance(body, dict):
+                body["profile"] = {"id": profile_id, "elapsed_s": round(elapsed, 6), "top": summarize(profiler)}
+                response.set_data(make_response(body).get_data())
+            return response
+        finally:
+            _profile_lock.release()
+
+    return wrapper
@@ -0,0 +1,389 @@
+# refresh_scheduler.py
+import bisect
+import hashlib
+import heapq
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import db
+
+DB_PATH = "scores.db"
+
+DEFAULT_UNIVERSE = ["TSLA", "AAPL", "MSFT"]
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS scheduler_lease (
+  name TEXT PRIMARY KEY,
+  holder TEXT NOT NULL,
+  expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scheduler_cycles (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  host TEXT NOT NULL,
+  started_at REAL NOT NULL,
+  duration_s REAL NOT NULL,
+  interval_s REAL NOT NULL,
+  tickers INTEGER NOT NULL,
+  errors INTEGER NOT NULL,
+  overran INTEGER NOT NULL,
+  backlog INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS ticker_demand (
+  ticker TEXT PRIMARY KEY,
+  hits REAL NOT NULL,
+  updated_at REAL NOT NULL
+);
+"""
+
+def ensure_schema(db_path: str = DB_PATH):
+    con = db.connect(db_path)
+    try:
+        cur = con.cursor()
+        for stmt in SCHEMA_SQL.strip().split(";"):
+            s = stmt.strip()
+            if s:
+                cur.execute(s)
+        cols = [r[1] for r in cur.execute("PRAGMA table_info(scheduler_cycles)")]
+        if "backlog" not in cols:
+            cur.execute("ALTER TABLE scheduler_cycles ADD COLUMN backlog INTEGER NOT NULL DEFAULT 0")
+        con.commit()
+    finally:
+        con.close()
+
+# -------------------------------
+# Ticker universe
+# -------------------------------
+def load_universe() -> List[str]:
+    """Tickers to refresh: TICKER_UNIVERSE_FILE (one per line, # comments), else TRACKED_TICKERS, else the defaults."""
+    path = os.environ.get("TICKER_UNIVERSE_FILE")
+    if path:
+        return read_universe_file(path)
+    if os.environ.get("TRACKED_TICKERS"):
+        return normalize_tickers(os.environ["TRACKED_TICKERS"].split(","))
+    return normalize_tickers(DEFAULT_UNIVERSE)
+
+def read_universe_file(path: str) -> List[str]:
+    """Tickers from a file with one per line; '#' starts a comment."""
+    with open(path) as f:
+        return normalize_tickers(line.split("#", 1)[0] for line in f)
+
+def normalize_tickers(raw: Iterable[str]) -> List[str]:
+    """Upper-cased, blank-free, de-duplicated tickers in their original order."""
+    seen = set()
+    tickers = []
+    for t in raw:
+        t = t.strip().upper()
+        if t and t not in seen:
+            seen.add(t)
+            tickers.append(t)
+    return tickers
+
+# -------------------------------
+# Consistent hashing across hosts
+# -------------------------------
+def _hash(key: str) -> int:
+    return int(hashlib.md5(key.encode()).hexdigest()[:16], 16)
+
+class HashRing:
+    """Consistent-hash ring; adding or removing a host only moves that host's share of tickers."""
+
+    def __init__(self, nodes: List[str], replicas: int = 100):
+        self._ring = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas))
+        self._keys = [k for k, _ in self._ring]
+
+    def node_for(self, key: str) -> Optional[str]:
+        if not self._ring:
+            return None
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._ring)
+        return self._ring[i][1]
+
+def host_id() -> str:
+    return os.environ.get("SCHEDULER_HOST_ID") or socket.gethostname()
+
+def shard_universe(tickers: List[str], hosts: Optional[List[str]] = None, me: Optional[str] = None) -> List[str]:
+    """Subset of tickers owned by this host. With no SCHEDULER_HOSTS configured, this host owns everything."""
+    if hosts is None:
+        hosts = [h.strip() for h in os.environ.get("SCHEDULER_HOSTS", "").split(",") if h.strip()]
+    if not hosts:
+        return tickers
+    me = me or host_id()
+    ring = HashRing(hosts)
+    return [t for t in tickers if ring.node_for(t) == me]
+
+# -------------------------------
+# Leader lease (one refreshing process per host)
+# -------------------------------
+class LeaderLease:
+    """Time-limited lease row in SQLite. The holder must renew it before ttl seconds pass."""
+
+    def __init__(self, name: str, ttl: float = 60.0, db_path: str = DB_PATH):
+        self.name = name
+        self.ttl = ttl
+        self.db_path = db_path
+        self.holder = f"{host_id()}:{os.getpid()}"
+        self.held = False
+
+    def try_acquire(self) -> bool:
+        """Take the lease if it is free or expired, or renew it if we already hold it."""
+        now = time.time()
+        con = db.connect(self.db_path, timeout=5, isolation_level=None)
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            row = con.execute("SELECT holder, expires_at FROM scheduler_lease WHERE name = ?", (self.name,)).fetchone()
+            if row is None or row[0] == self.holder or row[1] < now:
+                con.execute(
+                    "INSERT OR REPLACE INTO scheduler_lease (name, holder, expires_at) VALUES (?, ?, ?)",
+                    (self.name, self.holder, now + self.ttl),
+                )
+                self.held = True
+            else:
+                self.held = False
+            con.execute("COMMIT")
+        except sqlite3.OperationalError:
+            # DB busy: leave `held` as it was; an unrenewed lease still expires on its own
+            pass
+        finally:
+            con.close()
+        return self.held
+
+    def release(self):
+        if not self.held:
+            return
+        con = db.connect(self.db_path, timeout=5)
+        try:
+            con.execute("DELETE FROM scheduler_lease WHERE name = ? AND holder = ?", (self.name, self.holder))
+            con.commit()
+        finally:
+            con.close()
+        self.held = False
+
+# -------------------------------
+# Cycle metrics
+# -------------------------------
+def record_cycle(started_at: float, duration_s: float, interval_s: float, tickers: int, errors: int,
+                 backlog: int = 0, db_path: str = DB_PATH) -> bool:
+    """Store one refresh cycle; returns True if it overran its interval."""
+    overran = duration_s > interval_s
+    con = db.connect(db_path, timeout=5)
+    try:
+        con.execute(
+            """
+            INSERT INTO scheduler_cycles (host, started_at, duration_s, interval_s, tickers, errors, overran, backlog)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (host_id(), started_at, duration_s, interval_s, tickers, errors, int(overran), backlog),
+        )
+        con.commit()
+    finally:
+        con.close()
+    return overran
+
+def recent_cycles(limit: int = 20, db_path: str = DB_PATH) -> List[dict]:
+    con = db.connect(db_path)
+    try:
+        cur = con.execute(
+            """
+            SELECT host, started_at, duration_s, interval_s, tickers, errors, overran, backlog
+            FROM scheduler_cycles ORDER BY id DESC LIMIT ?
+            """,
+            (limit,),
+        )
+        return [
+            {
+                "host": host,
+                "started_at": started_at,
+                "duration_s": round(duration_s, 3),
+                "interval_s": interval_s,
+                "tickers": tickers,
+                "errors": errors,
+                "utilization": round(duration_s / interval_s, 3) if interval_s else None,
+                "overran": bool(overran),
+                "backlog": backlog,
+            }
+            for host, started_at, duration_s, interval_s, tickers, errors, overran, backlog in cur.fetchall()
+        ]
+    finally:
+        con.close()
+
+# -------------------------------
+# Request demand (fed by /predict and /history in every worker)
+# -------------------------------
+DEMAND_HALF_LIFE_S = 6 * 3600
+# tickers per IN (...) query; SQLite builds before 3.32 allow at most 999 bound parameters
+DEMAND_CHUNK = 500
+
+class DemandCounter:
+    """Per-process request tally, periodically folded into the shared ticker_demand table."""
+
+    def __init__(self):
+        self._hits = Counter()
+        self._lock = threading.Lock()
+
+    def hit(self, ticker: str):
+        with self._lock:
+            self._hits[ticker.upper()] += 1
+
+    def flush(self, db_path: str = DB_PATH):
+        with self._lock:
+            hits, self._hits = self._hits, Counter()
+        if not hits:
+            return
+        now = time.time()
+        con = db.connect(db_path, timeout=5)
+        try:
+            cur = con.cursor()
+            existing = {}
+            tickers = list(hits)
+            # chunked to stay under SQLite's bound-parameter limit, as in load_demand
+            for i in range(0, len(tickers), DEMAND_CHUNK):
+                chunk = tickers[i:i + DEMAND_CHUNK]
+                for t, h, u in cur.execute(
+                    f"SELECT ticker, hits, updated_at FROM ticker_demand WHERE ticker IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ):
+                    existing[t] = (h, u)
+            rows = []
+            for ticker, n in hits.items():
+                old, updated_at = existing.get(ticker, (0.0, now))
+                rows.append((ticker, _decay(old, now - updated_at) + n, now))
+            cur.executemany("INSERT OR REPLACE INTO ticker_demand (ticker, hits, updated_at) VALUES (?, ?, ?)", rows)
+            con.commit()
+        finally:
+            con.close()
+
+def _decay(hits: float, age_s: float) -> float:
+    return hits * math.pow(0.5, max(age_s, 0) / DEMAND_HALF_LIFE_S)
+
+def load_demand(tickers: Iterable[str], db_path: str = DB_PATH) -> Dict[str, float]:
+    tickers = list(tickers)
+    if not tickers:
+        return {}
+    now = time.time()
+    con = db.connect(db_path)
+    try:
+        demand = {}
+        # chunked to stay under SQLite's bound-parameter limit
+        for i in range(0, len(tickers), DEMAND_CHUNK):
+            chunk = tickers[i:i + DEMAND_CHUNK]
+            for t, h, u in con.execute(
+                f"SELECT ticker, hits, updated_at FROM ticker_demand WHERE ticker IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ):
+                demand[t] = _decay(h, now - u)
+        return demand
+    finally:
+        con.close()
+
+# -------------------------------
+# Adaptive priority queue
+# -------------------------------
+# Thresholds used by model.rule_based_score, with the distance that counts as "far" from each
+RULE_THRESHOLDS = [
+    ("change_1d", -2.0, 2.0),
+    ("change_1d", 2.0, 2.0),
+    ("debt_to_equity", 200.0, 100.0),
+    ("pe_ratio", 30.0, 15.0),
+    ("market_cap", 1e11, 5e10),
+]
+
+PRIORITY_WEIGHTS = {"volatility": 0.35, "news": 0.2, "threshold": 0.2, "demand": 0.25}
+
+def threshold_proximity(features: dict) -> float:
+    """1.0 when some feature sits right on a rule threshold, falling to 0.0 once all are far away."""
+    closest = min(
+        abs(float(features.get(name) or 0.0) - threshold) / scale
+        for name, threshold, scale in RULE_THRESHOLDS
+    )
+    return max(0.0, 1.0 - closest)
+
+class PriorityRefreshQueue:
+    """Min-heap of (next_due, ticker). Each observation reschedules a ticker between
+    min_interval and max_interval according to how much it is moving and how much it is asked for."""
+
+    def __init__(self, min_interval: float, max_interval: float, alpha: float = 0.3):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.alpha = alpha
+        self._heap = []
+        self._due = {}
+        self._volatility = {}
+        self._news_rate = {}
+        self._headlines = {}
+        self._lock = threading.Lock()
+
+    def sync(self, tickers: Iterable[str], now: Optional[float] = None):
+        """Add new tickers as due immediately and forget ones no longer in the universe."""
+        now = time.time() if now is None else now
+        tickers = set(tickers)
+        with self._lock:
+            for t in tickers - self._due.keys():
+                self._push(t, now)
+            for t in self._due.keys() - tickers:
+                # heap entries for dropped tickers are skipped lazily in pop_due
+                del self._due[t]
+                self._volatility.pop(t, None)
+                self._news_rate.pop(t, None)
+                self._headlines.pop(t, None)
+
+    def _push(self, ticker: str, due: float):
+        self._due[ticker] = due
+        heapq.heappush(self._heap, (due, ticker))
+
+    def pop_due(self, budget: int, now: Optional[float] = None) -> List[str]:
+        """Up to `budget` of the most overdue tickers."""
+        now = time.time() if now is None else now
+        out = []
+        with self._lock:
+            while self._heap and len(out) < budget and self._heap[0][0] <= now:
+                due, ticker = heapq.heappop(self._heap)
+                if self._due.get(ticker) == due:
+                    out.append(ticker)
+        return out
+
+    def backlog(self, now: Optional[float] = None) -> int:
+        """Number of tickers that are already due."""
+        now = time.time() if now is None else now
+        with self._lock:
+            return sum(1 for due in self._due.values() if due <= now)
+
+    def __len__(self):
+        return len(self._due)
+
+    def observe(self, ticker: str, features: dict, demand: float = 0.0, now: Optional[float] = None) -> float:
+        """Fold a fresh observation into the ticker's stats and schedule its next refresh. Returns the priority."""
+        now = time.time() if now is None else now
+        a = self.alpha
+        with self._lock:
+            if ticker not in self._due:
+                return 0.0
+            vol = a * abs(float(features.get("change_1d") or 0.0)) + (1 - a) * self._volatility.get(ticker, 0.0)
+            headlines = set(features.get("headlines") or [])
+            new_headlines = len(headlines - self._headlines.get(ticker, set())) if ticker in self._headlines else 0
+            news = a * new_headlines + (1 - a) * self._news_rate.get(ticker, 0.0)
+            self._volatility[ticker] = vol
+            self._news_rate[ticker] = news
+            self._headlines[ticker] = headlines
+
+            parts = {
+                "volatility": min(vol / 5.0, 1.0),
+                "news": min(news / 5.0, 1.0),
+                "threshold": threshold_proximity(features),
+                "demand": min(math.log1p(demand) / math.log1p(50), 1.0),
+            }
+            priority = sum(PRIORITY_WEIGHTS[k] * v for k, v in parts.items())
+            # geometric interpolation: priority 1 -> min_interval, 0 -> max_interval
+            interval = self.max_interval * (self.min_interval / self.max_interval) ** priority
+            self._push(ticker, now + interval)
+            return priority
+
+    def retry_later(self, ticker: str, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            if ticker in self._due:
+                self._push(ticker, now + self.min_interval)
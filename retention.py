@@ -0,0 +1,294 @@
+# retention.py
+"""Keep scores.db bounded: expire old raw rows into the rollups, prune old JSON, vacuum in steps.
+
+Raw score_rows are kept for RETENTION_RAW_DAYS; hourly and daily rollups keep the long
+history. score_details (explanation/events/headlines JSON) is dropped after
+RETENTION_DETAIL_DAYS while the typed row stays. Every step is a short transaction
+so the score writer is never blocked for long.
+
+    python retention.py --db scores.db            # one pass with the env policy
+    python retention.py --raw-days 14 --dry-run   # report what would be removed
+    python retention.py --convert                 # one-off full VACUUM to enable incremental vacuum
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import db
+import metrics
+import rollups
+import score_store
+
+DB_PATH = "scores.db"
+
+# 0 disables the step
+RETENTION_RAW_DAYS = float(os.environ.get("RETENTION_RAW_DAYS", 90))
+RETENTION_DETAIL_DAYS = float(os.environ.get("RETENTION_DETAIL_DAYS", 14))
+# rows removed per transaction, and the pause between transactions
+RETENTION_BATCH = int(os.environ.get("RETENTION_BATCH", 2000))
+RETENTION_PAUSE_MS = float(os.environ.get("RETENTION_PAUSE_MS", 20))
+# pages released per incremental_vacuum step, and the total time a pass may spend vacuuming
+VACUUM_STEP_PAGES = int(os.environ.get("VACUUM_STEP_PAGES", 256))
+VACUUM_BUDGET_S = float(os.environ.get("VACUUM_BUDGET_S", 5))
+
+def _cutoff(days: float, now: Optional[datetime] = None) -> Optional[str]:
+    if not days:
+        return None
+    return score_store.format_ts((now or datetime.utcnow()) - timedelta(days=days))
+
+def raw_cutoff(now: Optional[datetime] = None) -> Optional[datetime]:
+    """Oldest timestamp still guaranteed to have raw rows, or None when raw rows never expire."""
+    cutoff = _cutoff(RETENTION_RAW_DAYS, now)
+    return datetime.fromisoformat(cutoff) if cutoff else None
+
+def _pause():
+    if RETENTION_PAUSE_MS:
+        time.sleep(RETENTION_PAUSE_MS / 1000)
+
+def _get_meta(key: str, db_path: str) -> Optional[str]:
+    con = db.connect(db_path)
+    try:
+        row = con.execute("SELECT value FROM score_store_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    finally:
+        con.close()
+
+def _set_meta(key: str, value: str, db_path: str):
+    con = db.connect(db_path)
+    try:
+        con.execute("INSERT OR REPLACE INTO score_store_meta (key, value) VALUES (?, ?)", (key, value))
+        con.commit()
+    finally:
+        con.close()
+
+def _tickers(db_path: str):
+    con = db.connect(db_path)
+    try:
+        return [r[0] for r in con.execute("SELECT DISTINCT ticker FROM score_rows")]
+    finally:
+        con.close()
+
+# -------------------------------
+# Steps
+# -------------------------------
+def _roll_up_missing(con, rows):
+    """Fold rows whose hour bucket does not exist yet (e.g. seeded without rollups) before they go."""
+    seen = {}
+    for ticker, ts, rule_score, ml_score, final_score in rows:
+        key = (ticker, rollups.to_utc(ts).strftime(rollups.BUCKETS["hour"]))
+        if key not in seen:
+            seen[key] = con.execute(
+                "SELECT 1 FROM score_rollups WHERE ticker = ? AND bucket = 'hour' AND bucket_start = ?", key
+            ).fetchone() is None
+        if seen[key]:
+            rollups.record_score(ticker, ts, rule_score, ml_score, final_score, con=con)
+
+def expire_raw(cutoff: str, db_path: str = DB_PATH, dry_run: bool = False) -> int:
+    """Delete score_rows (and their details) older than `cutoff`, after making sure rollups cover them."""
+    removed = 0
+    for ticker in _tickers(db_path):
+        while True:
+            con = db.connect(db_path, timeout=10)
+            try:
+                if dry_run:
+                    removed += con.execute(
+                        "SELECT COUNT(*) FROM score_rows WHERE ticker = ? AND ts < ? AND coalesce(last_seen, ts) < ?",
+                        (ticker, cutoff, cutoff),
+                    ).fetchone()[0]
+                    break
+                # a row still being re-observed (last_seen past the cutoff) is kept
+                rows = con.execute(
+                    "SELECT id, ticker, ts, rule_score, ml_score, final_score FROM score_rows "
+                    "WHERE ticker = ? AND ts < ? AND coalesce(last_seen, ts) < ? ORDER BY ts LIMIT ?",
+                    (ticker, cutoff, cutoff, RETENTION_BATCH),
+                ).fetchall()
+                if not rows:
+                    break
+                ids = [r[0] for r in rows]
+                marks = ",".join("?" * len(ids))
+                _roll_up_missing(con, [r[1:] for r in rows])
+                con.execute(f"DELETE FROM score_details WHERE score_id IN ({marks})", ids)
+                con.execute(f"DELETE FROM score_explanations WHERE score_id IN ({marks})", ids)
+                con.execute(f"DELETE FROM score_rows WHERE id IN ({marks})", ids)
+                con.commit()
+                removed += len(ids)
+            finally:
+                con.close()
+            _pause()
+    return removed
+
+def prune_details(cutoff: str, db_path: str = DB_PATH, dry_run: bool = False) -> int:
+    """Drop the JSON details of rows last seen before `cutoff`; typed columns and scores stay.
+
+    A pass leaves details only on rows still current at its cutoff, and per ticker that can
+    only be the newest row before it (older rows end where the next one starts). So the
+    next pass reads, through the (ticker, ts) index, just the rows from that one up to the
+    new cutoff. The first pass, with no recorded cutoff, walks all of score_details.
+    """
+    previous = _get_meta("details_pruned_before", db_path)
+    removed, pending = 0, []
+
+    def flush(con):
+        nonlocal removed
+        while pending:
+            ids = pending[:RETENTION_BATCH]
+            del pending[:RETENTION_BATCH]
+            if not dry_run:
+                con.execute(f"DELETE FROM score_details WHERE score_id IN ({','.join('?' * len(ids))})", ids)
+                con.commit()
+                _pause()
+            removed += len(ids)
+
+    con = db.connect(db_path, timeout=10)
+    try:
+        if previous is None:
+            after = 0
+            while True:
+                rows = con.execute(
+                    "SELECT d.score_id, coalesce(r.last_seen, r.ts) < ? FROM score_details d "
+                    "JOIN score_rows r ON r.id = d.score_id WHERE d.score_id > ? ORDER BY d.score_id LIMIT ?",
+                    (cutoff, after, RETENTION_BATCH),
+                ).fetchall()
+                if not rows:
+                    break
+                after = rows[-1][0]
+                pending += [score_id for score_id, expired in rows if expired]
+                if len(pending) >= RETENTION_BATCH:
+                    flush(con)
+        else:
+            since = min(previous, cutoff)
+            for ticker in _tickers(db_path):
+                pending += [r[0] for r in con.execute(
+                    "SELECT r.id FROM score_rows r JOIN score_details d ON d.score_id = r.id "
+                    "WHERE r.ticker = ? AND r.ts < ? AND coalesce(r.last_seen, r.ts) < ? AND r.ts >= coalesce("
+                    "(SELECT ts FROM score_rows WHERE ticker = ? AND ts < ? ORDER BY ts DESC, id DESC LIMIT 1), ?)",
+                    (ticker, cutoff, cutoff, ticker, since, since),
+                )]
+                if len(pending) >= RETENTION_BATCH:
+                    flush(con)
+        flush(con)
+    finally:
+        con.close()
+    if not dry_run:
+        _set_meta("details_pruned_before", cutoff, db_path)
+    return removed
+
+def expire_legacy(cutoff: str, db_path: str = DB_PATH, dry_run: bool = False) -> int:
+    """Apply the raw cutoff to the pre-score_store tables once they have been migrated."""
+    if _get_meta("legacy_migrated", db_path) is None:
+        return 0
+    removed = 0
+    for table, ts_col in (("scores", "timestamp"), ("snapshots", "ts")):
+        con = db.connect(db_path, timeout=10)
+        try:
+            if not con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+                continue
+            # legacy rows mix "T"/" " separators and "+00:00"/naive forms; normalize the first 19 characters
+            where = f"replace(substr({ts_col}, 1, 19), ' ', 'T') < substr(?, 1, 19)"
+            if dry_run:
+                removed += con.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", (cutoff,)).fetchone()[0]
+                continue
+            while True:
+                n = con.execute(
+                    f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE {where} LIMIT ?)",
+                    (cutoff, RETENTION_BATCH),
+                ).rowcount
+                con.commit()
+                removed += n
+                if n < RETENTION_BATCH:
+                    break
+                _pause()
+        finally:
+            con.close()
+    return removed
+
+def incremental_vacuum(db_path: str = DB_PATH, budget_s: float = VACUUM_BUDGET_S) -> int:
+    """Release free pages in VACUUM_STEP_PAGES steps until none are left or the budget runs out."""
+    con = db.connect(db_path, timeout=10, isolation_level=None)
+    try:
+        if con.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return 0
+        start_free = free = con.execute("PRAGMA freelist_count").fetchone()[0]
+        deadline = time.monotonic() + budget_s
+        while free and time.monotonic() < deadline:
+            # executescript steps the pragma to completion; execute() would free a single page
+            con.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES});")
+            free = con.execute("PRAGMA freelist_count").fetchone()[0]
+            _pause()
+        if free != start_free:
+            # under WAL the file only shrinks once the truncated pages are checkpointed
+            con.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+        return start_free - free
+    finally:
+        con.close()
+
+def convert_to_incremental(db_path: str = DB_PATH):
+    """Switch an existing database to auto_vacuum=INCREMENTAL; needs one full (blocking) VACUUM."""
+    con = db.connect(db_path, timeout=60, isolation_level=None)
+    try:
+        con.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        con.execute("VACUUM")
+    finally:
+        con.close()
+
+def db_size(db_path: str = DB_PATH) -> Dict[str, int]:
+    con = db.connect(db_path)
+    try:
+        page_size = con.execute("PRAGMA page_size").fetchone()[0]
+        pages = con.execute("PRAGMA page_count").fetchone()[0]
+        free = con.execute("PRAGMA freelist_count").fetchone()[0]
+        return {"bytes": page_size * pages, "free_bytes": page_size * free}
+    finally:
+        con.close()
+
+# -------------------------------
+# Policy pass
+# -------------------------------
+def run(db_path: str = DB_PATH, raw_days: float = None, detail_days: float = None, dry_run: bool = False,
+        now: Optional[datetime] = None) -> Dict[str, int]:
+    """One retention pass: expire raw rows, prune details, trim legacy tables, then vacuum."""
+    raw_days = RETENTION_RAW_DAYS if raw_days is None else raw_days
+    detail_days = RETENTION_DETAIL_DAYS if detail_days is None else detail_days
+    started = time.time()
+    stats = {"raw_rows": 0, "details": 0, "legacy_rows": 0, "vacuum_pages": 0}
+
+    raw = _cutoff(raw_days, now)
+    detail = _cutoff(detail_days, now)
+    if raw:
+        stats["raw_rows"] = expire_raw(raw, db_path, dry_run)
+        stats["legacy_rows"] = expire_legacy(raw, db_path, dry_run)
+    if detail:
+        stats["details"] = prune_details(detail, db_path, dry_run)
+    if not dry_run:
+        stats["vacuum_pages"] = incremental_vacuum(db_path)
+
+    size = db_size(db_path)
+    stats.update(size)
+    metrics.observe("retention_pass", time.time() - started)
+    metrics.set_gauge("db_size_bytes", size["bytes"])
+    metrics.set_gauge("db_free_bytes", size["free_bytes"])
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--raw-days", type=float, default=RETENTION_RAW_DAYS)
+    parser.add_argument("--detail-days", type=float, default=RETENTION_DETAIL_DAYS)
+    parser.add_argument("--dry-run", action="store_true", help="count what would be removed")
+    parser.add_argument("--convert", action="store_true", help="enable incremental vacuum with a full VACUUM first")
+    args = parser.parse_args()
+
+    score_store.ensure_schema(args.db)
+    if args.convert:
+        print(f"🧹 Running a full VACUUM on {args.db} to enable incremental vacuum ...")
+        convert_to_incremental(args.db)
+    stats = run(args.db, args.raw_days, args.detail_days, args.dry_run)
+    verb = "would remove" if args.dry_run else "removed"
+    print(f"✅ Retention {verb} {stats['raw_rows']} raw rows, {stats['details']} detail payloads, "
+          f"{stats['legacy_rows']} legacy rows; vacuumed {stats['vacuum_pages']} pages. "
+          f"DB is {stats['bytes'] / 1e6:.1f} MB ({stats['free_bytes'] / 1e6:.1f} MB free).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# rollups.py
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import db
+
+DB_PATH = "scores.db"
+
+BUCKETS = {
+    "hour": "%Y-%m-%dT%H:00:00",
+    "day": "%Y-%m-%dT00:00:00",
+}
+SCORES = ("rule", "ml", "final")
+
+# min/max/sum/last per score and bucket; mean is sum / n (ml has its own count since it may be NULL)
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS score_rollups (
+  ticker TEXT NOT NULL,
+  bucket TEXT NOT NULL,
+  bucket_start TEXT NOT NULL,
+  n INTEGER NOT NULL,
+  ml_n INTEGER NOT NULL,
+  last_ts TEXT NOT NULL,
+  rule_min REAL, rule_max REAL, rule_sum REAL, rule_last REAL,
+  ml_min REAL, ml_max REAL, ml_sum REAL, ml_last REAL,
+  final_min REAL, final_max REAL, final_sum REAL, final_last REAL,
+  PRIMARY KEY (ticker, bucket, bucket_start)
+) WITHOUT ROWID;
+"""
+
+def _upsert_sql() -> str:
+    updates = ["n = n + 1", "ml_n = ml_n + excluded.ml_n",
+               "last_ts = max(last_ts, excluded.last_ts)"]
+    for s in SCORES:
+        # scalar min()/max() return NULL if either side is NULL, so fall back to whichever exists
+        updates += [
+            f"{s}_min = coalesce(min({s}_min, excluded.{s}_min), {s}_min, excluded.{s}_min)",
+            f"{s}_max = coalesce(max({s}_max, excluded.{s}_max), {s}_max, excluded.{s}_max)",
+            f"{s}_sum = coalesce({s}_sum, 0) + coalesce(excluded.{s}_sum, 0)",
+            f"{s}_last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.{s}_last ELSE {s}_last END",
+        ]
+    return f"""
+        INSERT INTO score_rollups
+        (ticker, bucket, bucket_start, n, ml_n, last_ts,
+         rule_min, rule_max, rule_sum, rule_last,
+         ml_min, ml_max, ml_sum, ml_last,
+         final_min, final_max, final_sum, final_last)
+        VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(ticker, bucket, bucket_start) DO UPDATE SET {", ".join(updates)}
+    """
+
+UPSERT_SQL = _upsert_sql()
+
+def ensure_schema(db_path: str = DB_PATH):
+    con = db.connect(db_path)
+    try:
+        cur = con.cursor()
+        for stmt in SCHEMA_SQL.strip().split(";"):
+            s = stmt.strip()
+            if s:
+                cur.execute(s)
+        con.commit()
+    finally:
+        con.close()
+
+def to_utc(ts: Union[str, datetime]) -> datetime:
+    """Naive UTC datetime from an ISO string or datetime (scores store naive UTC, snapshots store +00:00)."""
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+def record_score(ticker: str, ts: Union[str, datetime], rule_score: Optional[float],
+                 ml_score: Optional[float], final_score: Optional[float],
+                 con: Optional[sqlite3.Connection] = None, db_path: str = DB_PATH):
+    """Fold one score into its hour and day buckets. Pass `con` to join the caller's transaction."""
+    ts = to_utc(ts)
+    values = {"rule": rule_score, "ml": ml_score, "final": final_score}
+    rows = []
+    for bucket, fmt in BUCKETS.items():
+        row = [ticker, bucket, ts.strftime(fmt), int(ml_score is not None), ts.isoformat()]
+        for s in SCORES:
+            v = values[s]
+            row += [v, v, v, v]
+        rows.append(row)
+
+    own = con is None
+    if own:
+        con = db.connect(db_path, timeout=10)
+    try:
+        con.executemany(UPSERT_SQL, rows)
+        if own:
+            con.commit()
+    finally:
+        if own:
+            con.close()
+
+def rebuild(con: sqlite3.Connection, batch_size: int = 5000):
+    """Recompute every bucket from score_rows inside the caller's transaction.
+
+    Counts rows, the same rule score_store.insert_scores follows: repeats folded into
+    last_seen by its dedupe are not counted on either path.
+    """
+    con.execute("DELETE FROM score_rollups")
+    cur = con.execute("SELECT ticker, ts, rule_score, ml_score, final_score FROM score_rows ORDER BY ts, id")
+    while True:
+        batch = cur.fetchmany(batch_size)
+        if not batch:
+            break
+        for ticker, ts, rule_score, ml_score, final_score in batch:
+            record_score(ticker, ts, rule_score, ml_score, final_score, con=con)
+
+def count_buckets(ticker: str, bucket: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                  db_path: str = DB_PATH) -> int:
+    where, params = _range(ticker, bucket, since, until)
+    con = db.connect(db_path)
+    try:
+        return con.execute(f"SELECT COUNT(*) FROM score_rollups WHERE {where}", params).fetchone()[0]
+    finally:
+        con.close()
+
+def get_rollups(ticker: str, bucket: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                db_path: str = DB_PATH) -> List[Dict[str, Any]]:
+    """Oldest-first buckets with min/max/mean/last for each score."""
+    where, params = _range(ticker, bucket, since, until)
+    con = db.connect(db_path)
+    con.row_factory = sqlite3.Row
+    try:
+        rows = con.execute(
+            f"SELECT * FROM score_rollups WHERE {where} ORDER BY bucket_start", params
+        ).fetchall()
+    finally:
+        con.close()
+
+    out = []
+    for r in rows:
+        entry = {"bucket_start": r["bucket_start"], "n": r["n"], "last_ts": r["last_ts"]}
+        for s in SCORES:
+            n = r["ml_n"] if s == "ml" else r["n"]
+            entry[s] = {
+                "min": r[f"{s}_min"],
+                "max": r[f"{s}_max"],
+                "mean": r[f"{s}_sum"] / n if n else None,
+                "last": r[f"{s}_last"],
+            }
+        out.append(entry)
+    return out
+
+def _range(ticker, bucket, since, until) -> Tuple[str, list]:
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket {bucket!r}, expected one of {', '.join(BUCKETS)}")
+    where, params = "ticker = ? AND bucket = ?", [ticker, bucket]
+    if since:
+        # include the bucket that contains `since`
+        where += " AND bucket_start >= ?"
+        params.append(to_utc(since).strftime(BUCKETS[bucket]))
+    if until:
+        where += " AND bucket_start < ?"
+        params.append(to_utc(until).isoformat())
+    return where, params
+
+# -------------------------------
+# Largest-Triangle-Three-Buckets downsampling
+# -------------------------------
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """Indices of at most `threshold` points that preserve the visual shape of (xs, ys).
+
+    Keeps the first and last point; from each of the threshold-2 middle buckets it keeps
+    the point forming the largest triangle with the previous pick and the next bucket's mean.
+    """
+    n = len(xs)
+    if threshold >= n:
+        return list(range(n))
+    if threshold < 3:
+        raise ValueError("LTTB needs a threshold of at least 3 points")
+
+    picked = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+        if next_start >= next_end:
+            avg_x, avg_y = xs[n - 1], ys[n - 1]
+        else:
+            span = next_end - next_start
+            avg_x = sum(xs[next_start:next_end]) / span
+            avg_y = sum(ys[next_start:next_end]) / span
+
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, min(end, n - 1)):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        picked.append(best)
+        a = best
+
+    picked.append(n - 1)
+    return picked
@@ -0,0 +1,374 @@
+# score_store.py
+"""Single home for every score: one typed row per distinct observation, details stored separately.
+
+An observation identical to the ticker's previous one (same content_hash) does not add
+a row; it only moves that row's last_seen forward.
+
+score_rows holds the seven numeric features and the three scores as real columns,
+so analytics and training never parse JSON. Rule explanations are typed rows in
+score_explanations, rendered to text on read. The bulky parts (events, headlines,
+provider errors) live in score_details and are only read when asked for.
+"""
+import hashlib
+import json
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import db
+import explanations
+import metrics
+import rollups
+
+DB_PATH = "scores.db"
+
+FEATURE_COLUMNS = ["change_1d", "debt_to_equity", "pe_ratio", "market_cap", "eps", "book_value", "news_sentiment"]
+SCORE_COLUMNS = ["rule_score", "ml_score", "final_score"]
+DETAIL_COLUMNS = ["explanation", "events", "headlines", "errors"]
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS score_rows (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ticker TEXT NOT NULL,
+  ts TEXT NOT NULL,
+  source TEXT NOT NULL,
+  change_1d REAL,
+  debt_to_equity REAL,
+  pe_ratio REAL,
+  market_cap REAL,
+  eps REAL,
+  book_value REAL,
+  news_sentiment REAL,
+  rule_score REAL,
+  ml_score REAL,
+  final_score REAL,
+  content_hash BLOB,
+  last_seen TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_score_rows_ticker_ts ON score_rows(ticker, ts);
+CREATE TABLE IF NOT EXISTS score_details (
+  score_id INTEGER PRIMARY KEY REFERENCES score_rows(id) ON DELETE CASCADE,
+  explanation TEXT,
+  events TEXT,
+  headlines TEXT,
+  errors TEXT
+);
+-- one row per rule that fired, rendered to a sentence from explanations.RULES on read
+CREATE TABLE IF NOT EXISTS score_explanations (
+  score_id INTEGER NOT NULL,
+  rule_id INTEGER NOT NULL,
+  value REAL,
+  delta INTEGER NOT NULL,
+  PRIMARY KEY (score_id, rule_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS score_store_meta (
+  key TEXT PRIMARY KEY,
+  value TEXT NOT NULL
+);
+"""
+
+INSERT_ROW_SQL = f"""
+    INSERT INTO score_rows (ticker, ts, source, {", ".join(FEATURE_COLUMNS + SCORE_COLUMNS)}, content_hash)
+    VALUES ({", ".join("?" * (4 + len(FEATURE_COLUMNS) + len(SCORE_COLUMNS)))})
+"""
+INSERT_DETAILS_SQL = """
+    INSERT INTO score_details (score_id, explanation, events, headlines, errors) VALUES (?, ?, ?, ?, ?)
+"""
+INSERT_EXPLANATION_SQL = """
+    INSERT OR REPLACE INTO score_explanations (score_id, rule_id, value, delta) VALUES (?, ?, ?, ?)
+"""
+
+def ensure_schema(db_path: str = DB_PATH):
+    con = db.connect(db_path)
+    try:
+        cur = con.cursor()
+        for stmt in SCHEMA_SQL.strip().split(";"):
+            s = stmt.strip()
+            if s:
+                cur.execute(s)
+        con.commit()
+        if {"content_hash", "last_seen"} - {r[1] for r in cur.execute("PRAGMA table_info(score_rows)")}:
+            # re-read under the write lock so concurrently booting workers add each column once
+            cur.execute("BEGIN IMMEDIATE")
+            cols = [r[1] for r in cur.execute("PRAGMA table_info(score_rows)")]
+            if "content_hash" not in cols:
+                cur.execute("ALTER TABLE score_rows ADD COLUMN content_hash BLOB")
+            if "last_seen" not in cols:
+                cur.execute("ALTER TABLE score_rows ADD COLUMN last_seen TEXT")
+            con.commit()
+    finally:
+        con.close()
+    rollups.ensure_schema(db_path)
+    migrate_legacy(db_path)
+
+def format_ts(ts: Union[str, datetime, None]) -> str:
+    """Fixed-width naive-UTC ISO string, so text order is time order."""
+    if ts is None:
+        ts = datetime.utcnow()
+    return rollups.to_utc(ts).isoformat(timespec="microseconds")
+
+def _float_or_none(value) -> Optional[float]:
+    return None if value is None else float(value)
+
+def _row_values(ticker: str, ts: str, source: str, features: Dict[str, Any], result: Dict[str, Any]) -> tuple:
+    rule_score = _float_or_none(result.get("rule_score"))
+    final_score = result.get("final_score")
+    return (
+        ticker, ts, source,
+        *(float(features.get(c) or 0.0) for c in FEATURE_COLUMNS),
+        rule_score,
+        _float_or_none(result.get("ml_score")),
+        _float_or_none(final_score if final_score is not None else rule_score),
+    )
+
+def _detail_values(features: Dict[str, Any], result: Dict[str, Any]) -> tuple:
+    # structured rule hits go to score_explanations; only free-text explanations are kept as JSON
+    explanation = None if result.get("rule_hits") else json.dumps(result.get("explanation") or [])
+    return (
+        explanation,
+        json.dumps(result.get("events") or [], default=str),
+        json.dumps(features.get("headlines") or []),
+        json.dumps(features.get("errors") or {}),
+    )
+
+def content_hash(features: Dict[str, Any], result: Dict[str, Any]) -> bytes:
+    """8-byte digest of the normalized feature vector, headline set and scores."""
+    parts = [f"{float(features.get(c) or 0.0):.6g}" for c in FEATURE_COLUMNS]
+    parts += [f"{float(result[c]):.4f}" if result.get(c) is not None else "-" for c in SCORE_COLUMNS]
+    parts += sorted({h.strip() for h in features.get("headlines") or []})
+    return hashlib.blake2b("\x1f".join(parts).encode(), digest_size=8).digest()
+
+def _latest_seen(cur, ticker: str):
+    """(id, content_hash, last observation ts) of the ticker's newest row, or None."""
+    return cur.execute(
+        "SELECT id, content_hash, coalesce(last_seen, ts) FROM score_rows WHERE ticker = ? "
+        "ORDER BY ts DESC, id DESC LIMIT 1",
+        (ticker,),
+    ).fetchone()
+
+def insert_scores(entries: Iterable[Tuple[str, Any, Dict[str, Any], Dict[str, Any]]], source: str = "app",
+                  details: bool = True, with_rollups: bool = True, dedupe: bool = True,
+                  con: Optional[sqlite3.Connection] = None, db_path: str = DB_PATH) -> List[int]:
+    """Write (ticker, ts, features, result) entries in one transaction, with their rollups. Returns row ids.
+
+    `result` is an explain_score()-style dict; only rule/ml/final_score are required.
+    With `dedupe`, an entry identical to the ticker's newest row (same content_hash) only
+    moves that row's last_seen forward. Rollups count rows, not repeats, so that
+rollups.rebuild() reproduces them exactly.
+    Pass `con` to join the caller's transaction (the caller commits).
+    """
+    own = con is None
+    if own:
+        con = db.connect(db_path, timeout=10)
+    try:
+        cur = con.cursor()
+        ids = []
+        latest = {}
+        for ticker, ts, features, result in entries:
+            ts = format_ts(ts)
+            values = _row_values(ticker, ts, source, features, result)
+            digest = content_hash(features, result)
+            if dedupe:
+                if ticker not in latest:
+                    latest[ticker] = _latest_seen(cur, ticker)
+                prev = latest[ticker]
+                if prev is not None and prev[1] == digest and ts > prev[2]:
+                    cur.execute("UPDATE score_rows SET last_seen = ? WHERE id = ?", (ts, prev[0]))
+                    latest[ticker] = (prev[0], digest, ts)
+                    ids.append(prev[0])
+                    metrics.cache_hit("score_dedup")
+                    continue
+                metrics.cache_miss("score_dedup")
+            cur.execute(INSERT_ROW_SQL, (*values, digest))
+            score_id = cur.lastrowid
+            ids.append(score_id)
+            if dedupe and (latest[ticker] is None or ts >= latest[ticker][2]):
+                latest[ticker] = (score_id, digest, ts)
+            if details:
+                cur.execute(INSERT_DETAILS_SQL, (score_id, *_detail_values(features, result)))
+                cur.executemany(
+                    INSERT_EXPLANATION_SQL,
+                    [(score_id, rule, value, delta) for rule, value, delta in result.get("rule_hits") or []],
+                )
+            if with_rollups:
+                rollups.record_score(ticker, ts, values[-3], values[-2], values[-1], con=con)
+        if own:
+            con.commit()
+        return ids
+    finally:
+        if own:
+            con.close()
+
+def insert_score(ticker: str, features: Dict[str, Any], result: Dict[str, Any], ts=None, source: str = "app",
+                 db_path: str = DB_PATH) -> int:
+    return insert_scores([(ticker, ts, features, result)], source=source, db_path=db_path)[0]
+
+# -------------------------------
+# Reads
+# -------------------------------
+def _range_filter(ticker: str, since=None, until=None, cursor: Optional[Tuple[str, int]] = None):
+    """Rows whose observed span [ts, last_seen] overlaps [since, until)."""
+    where, params = ["ticker = ?"], [ticker]
+    if since:
+        # a deduplicated row stays current until last_seen, even if ts is older than `since`. Only the
+        # ticker's newest row before `since` can do that (older rows end where the next one starts), so
+        # the lower bound drops to its ts when it is still current and the read stays an index range
+        where.append(
+            "ts >= coalesce((SELECT CASE WHEN coalesce(last_seen, ts) >= ? THEN ts END FROM score_rows"
+            " WHERE ticker = ? AND ts < ? ORDER BY ts DESC, id DESC LIMIT 1), ?)"
+        )
+        since = format_ts(since)
+        params += [since, ticker, since, since]
+    if until:
+        where.append("ts < ?")
+        params.append(format_ts(until))
+    if cursor:
+        where.append("(ts, id) < (?, ?)")
+        params += [cursor[0], cursor[1]]
+    return " AND ".join(where), params
+
+def count_range(ticker: str, since=None, until=None, db_path: str = DB_PATH) -> int:
+    where, params = _range_filter(ticker, since, until)
+    con = db.connect(db_path)
+    try:
+        return con.execute(f"SELECT COUNT(*) FROM score_rows WHERE {where}", params).fetchone()[0]
+    finally:
+        con.close()
+
+def query_rows(ticker: str, columns: Sequence[str], since=None, until=None,
+               cursor: Optional[Tuple[str, int]] = None, limit: Optional[int] = None,
+               newest_first: bool = True, db_path: str = DB_PATH) -> List[Dict[str, Any]]:
+    """Typed columns only (always including id and ts) for one ticker's range, without touching details."""
+    allowed = {"ticker", "source", "last_seen", *FEATURE_COLUMNS, *SCORE_COLUMNS}
+    unknown = set(columns) - allowed - {"id", "ts"}
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+    cols = ["id", "ts"] + [c for c in columns if c in allowed]
+    where, params = _range_filter(ticker, since, until, cursor)
+    order = "DESC" if newest_first else "ASC"
+    sql = f"SELECT {', '.join(cols)} FROM score_rows WHERE {where} ORDER BY ts {order}, id {order}"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    con = db.connect(db_path)
+    con.row_factory = sqlite3.Row
+    try:
+        return [dict(r) for r in con.execute(sql, params)]
+    finally:
+        con.close()
+
+def load_details(score_ids: Sequence[int], db_path: str = DB_PATH) -> Dict[int, Dict[str, Any]]:
+    """Decoded explanation/events/headlines/errors for the given rows, plus structured "rules".
+
+    Explanations stored as rule hits are rendered to text here; older rows fall back to their JSON text.
+    """
+    out = {}
+    if not score_ids:
+        return out
+    con = db.connect(db_path)
+    try:
+        for i in range(0, len(score_ids), 500):
+            chunk = list(score_ids[i:i + 500])
+            marks = ",".join("?" * len(chunk))
+            for score_id, *values in con.execute(
+                f"SELECT score_id, {', '.join(DETAIL_COLUMNS)} FROM score_details WHERE score_id IN ({marks})",
+                chunk,
+            ):
+                out[score_id] = {c: (json.loads(v) if v is not None else None) for c, v in zip(DETAIL_COLUMNS, values)}
+            hits = {}
+            for score_id, rule, value, delta in con.execute(
+                f"SELECT score_id, rule_id, value, delta FROM score_explanations WHERE score_id IN ({marks})",
+                chunk,
+            ):
+                hits.setdefault(score_id, []).append((rule, value, delta))
+            for score_id, records in hits.items():
+                entry = out.setdefault(score_id, {c: None for c in DETAIL_COLUMNS})
+                entry["explanation"] = explanations.render_all(records)
+                entry["rules"] = explanations.to_dicts(records)
+    finally:
+        con.close()
+    return out
+
+def latest_final_scores(ticker: str, limit: int, db_path: str = DB_PATH) -> List[Tuple[str, float]]:
+    """Newest-first (ts, final_score) pairs."""
+    con = db.connect(db_path)
+    try:
+        return con.execute(
+            "SELECT ts, final_score FROM score_rows WHERE ticker = ? ORDER BY ts DESC LIMIT ?", (ticker, limit)
+        ).fetchall()
+    finally:
+        con.close()
+
+def count_rows(db_path: str = DB_PATH) -> int:
+    con = db.connect(db_path)
+    try:
+        return con.execute("SELECT COUNT(*) FROM score_rows").fetchone()[0]
+    finally:
+        con.close()
+
+def training_columns_sql(target: str = "rule_score") -> str:
+    return f"SELECT {', '.join(FEATURE_COLUMNS)}, {target} FROM score_rows"
+
+# -------------------------------
+# One-time import of the legacy scores/snapshots tables
+# -------------------------------
+def migrate_legacy(db_path: str = DB_PATH, batch_size: int = 5000):
+    """Copy rows from the old `scores` (JSON blobs) and `snapshots` tables into score_rows once.
+
+    The legacy tables are left in place; a marker in score_store_meta, checked and written
+    under one write lock, prevents re-imports even when several processes start together.
+    Rollups are rebuilt from score_rows afterwards so migrated history is counted exactly once.
+    """
+    con = db.connect(db_path, timeout=30)
+    try:
+        if con.execute("SELECT 1 FROM score_store_meta WHERE key = 'legacy_migrated'").fetchone():
+            return
+        # every gunicorn worker gets here on first boot: take the write lock, then check again
+        con.execute("BEGIN IMMEDIATE")
+        if con.execute("SELECT 1 FROM score_store_meta WHERE key = 'legacy_migrated'").fetchone():
+            return
+        tables = {r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        migrated = 0
+
+        if "snapshots" in tables:
+            cur = con.execute(
+                f"SELECT ticker, ts, {', '.join(FEATURE_COLUMNS + SCORE_COLUMNS)} FROM snapshots ORDER BY id"
+            )
+            while True:
+                batch = cur.fetchmany(batch_size)
+                if not batch:
+                    break
+                entries = []
+                for ticker, ts, *values in batch:
+                    features = dict(zip(FEATURE_COLUMNS, values[:7]))
+                    result = dict(zip(SCORE_COLUMNS, values[7:]))
+                    entries.append((ticker, ts, features, result))
+                insert_scores(entries, source="collector", details=False, with_rollups=False, dedupe=False,
+                              con=con)
+                migrated += len(batch)
+
+        if "scores" in tables:
+            cur = con.execute(
+                "SELECT ticker, timestamp, rule_score, ml_score, final_score, features, explanation FROM scores ORDER BY id"
+            )
+            while True:
+                batch = cur.fetchmany(batch_size)
+                if not batch:
+                    break
+                entries = []
+                for ticker, ts, rule_score, ml_score, final_score, features, explanation in batch:
+                    features = json.loads(features) if features else {}
+                    result = {"rule_score": rule_score, "ml_score": ml_score, "final_score": final_score,
+                              "explanation": json.loads(explanation) if explanation else []}
+                    entries.append((ticker, ts or datetime.now(timezone.utc), features, result))
+                insert_scores(entries, source="app", with_rollups=False, dedupe=False, con=con)
+                migrated += len(batch)
+
+        if migrated:
+            rollups.rebuild(con)
+        con.execute("INSERT INTO score_store_meta (key, value) VALUES ('legacy_migrated', ?)", (str(migrated),))
+        con.commit()
+        if migrated:
+            print(f"✅ Migrated {migrated} legacy score rows into score_rows.")
+    finally:
+        con.close()
@@ -13,7 +13,7 @@ async function loadGraphs() {
     new Chart(document.getElementById("scoreChart"), {
       type: "line",
       data: {
-        labels: ["T1", "T2", "T3", "T4"], // Replace with real timestamps
+        labels: data.trends.timestamps.map(ts => new Date(ts + "Z").toLocaleString()),
         datasets: [
           { label: "Final Score", data: data.trends.final, borderColor: "#58a6ff", fill: false },
           { label: "Rule Score", data: data.trends.rule, borderColor: "#d29922", fill: false },
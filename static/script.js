@@ -9,91 +9,120 @@ async function getScores() {
 
   const tickers = tickersText.split(",").map(t => t.trim());
 
+  const resultsDiv = document.getElementById("results");
+  if (!resultsDiv) return alert("Missing container with id='results'");
+  resultsDiv.innerHTML = "";
+
+  // One placeholder card per ticker, in input order, filled in as results stream back
+  const cards = tickers.map(t => {
+    const card = document.createElement("div");
+    card.className = "card";
+    card.innerHTML = renderHeader(t.toUpperCase()) + `<div class="card-loading">Scoring…</div>`;
+    resultsDiv.appendChild(card);
+    return card;
+  });
+
   try {
-    const response = await fetch("/predict", {
+    const response = await fetch("/predict/stream", {
       method: "POST",
       headers: {"Content-Type": "application/json"},
       body: JSON.stringify({ tickers })
     });
+    if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = "";
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffered += decoder.decode(value, { stream: true });
+
+      const lines = buffered.split("\n");
+      buffered = lines.pop();
+      lines.filter(line => line.trim()).forEach(line => {
+        const result = JSON.parse(line);
+        const card = cards[result.index];
+        if (card) card.innerHTML = renderCard(tickers[result.index].toUpperCase(), result);
+      });
+    }
+  } catch (err) {
+    console.error(err);
+    alert("⚠️ Failed to fetch scores");
+  }
+}
 
-    const data = await response.json();
-    const resultsDiv = document.getElementById("results");
-    if (!resultsDiv) return alert("Missing container with id='results'");
-    resultsDiv.innerHTML = "";
-
-    // Map tickers to company details
-    const companyInfo = {
-      TSLA: { name: "Tesla", logo: "https://logo.clearbit.com/tesla.com" },
-      AAPL: { name: "Apple", logo: "https://logo.clearbit.com/apple.com" },
-      MSFT: { name: "Microsoft", logo: "https://logo.clearbit.com/microsoft.com" }
-    };
-
-    data.results.forEach((result, index) => {
-      const card = document.createElement("div");
-      card.className = "card";
-
-      const ticker = tickers[index]?.toUpperCase() || "UNKNOWN";
-      const company = companyInfo[ticker] || { name: ticker, logo: "https://logo.clearbit.com/yahoo.com" };
-
-      // Header
-      const header = `
-        <div class="card-header">
-          <img src="${company.logo}" alt="${company.name} logo" class="company-logo">
-          <span class="company-name">${company.name}</span>
-        </div>
-      `;
+// Map tickers to company details
+const companyInfo = {
+  TSLA: { name: "Tesla", logo: "https://logo.clearbit.com/tesla.com" },
+  AAPL: { name: "Apple", logo: "https://logo.clearbit.com/apple.com" },
+  MSFT: { name: "Microsoft", logo: "https://logo.clearbit.com/microsoft.com" }
+};
+
+function renderHeader(ticker) {
+  const company = companyInfo[ticker] || { name: ticker, logo: "https://logo.clearbit.com/yahoo.com" };
+  return `
+    <div class="card-header">
+      <img src="${company.logo}" alt="${company.name} logo" class="company-logo">
+      <span class="company-name">${company.name}</span>
+    </div>
+  `;
+}
 
-      // Scores
-      const scores = `
-        <div><strong>Final Score:</strong> ${result.final_score}</div>
-        <div><strong>Rule Score:</strong> ${result.rule_score}</div>
-        <div><strong>ML Score:</strong> ${result.ml_score ?? "N/A"}</div>
-      `;
+function renderCard(ticker, result) {
+  const header = renderHeader(ticker || "UNKNOWN");
 
-      // Explanation
-      const explanation = `
-        <h4>Explanation</h4>
-        <ul>${result.explanation.map(e => `<li>${e}</li>`).join("")}</ul>
-      `;
+  // A failed ticker does not abort the others, it just gets its own card
+  if (result.error) {
+    return header + `<div class="card-error">⚠️ ${result.error}</div>`;
+  }
 
-      // Events
-      let eventsHTML = "";
-      if (result.events && result.events.length > 0) {
-        eventsHTML = "<h4>Events</h4><div class='events-container'>";
-        
-        result.events.forEach(ev => {
-          let icon = "📰";
-          if (ev.sentiment > 0.2) icon = "📈";
-          if (ev.sentiment < -0.2) icon = "⚠️";
-
-          const shortHeadline = ev.headline.length > 60 
-            ? ev.headline.substring(0, 60) + "…" 
-            : ev.headline;
-
-          eventsHTML += `
-            <div class="event-card" title="${ev.headline}">
-              <span class="event-icon">${icon}</span>
-              <span class="event-text">${shortHeadline}</span>
-              <span class="event-sentiment">(${ev.sentiment})</span>
-            </div>
-          `;
-        });
-
-        eventsHTML += "</div>";
-      }
-
-      // Graph button
-      const graphButton = `
-        <button class="graph-btn" onclick="viewGraphs('${ticker}')">📊 View Graphs</button>
+  // Scores
+  const scores = `
+    <div><strong>Final Score:</strong> ${result.final_score}</div>
+    <div><strong>Rule Score:</strong> ${result.rule_score}</div>
+    <div><strong>ML Score:</strong> ${result.ml_score ?? "N/A"}</div>
+  `;
+
+  // Explanation
+  const explanation = `
+    <h4>Explanation</h4>
+    <ul>${result.explanation.map(e => `<li>${e}</li>`).join("")}</ul>
+  `;
+
+  // Events
+  let eventsHTML = "";
+  if (result.events && result.events.length > 0) {
+    eventsHTML = "<h4>Events</h4><div class='events-container'>";
+
+    result.events.forEach(ev => {
+      let icon = "📰";
+      if (ev.sentiment > 0.2) icon = "📈";
+      if (ev.sentiment < -0.2) icon = "⚠️";
+
+      const shortHeadline = ev.headline.length > 60
+        ? ev.headline.substring(0, 60) + "…"
+        : ev.headline;
+
+      eventsHTML += `
+        <div class="event-card" title="${ev.headline}">
+          <span class="event-icon">${icon}</span>
+          <span class="event-text">${shortHeadline}</span>
+          <span class="event-sentiment">(${ev.sentiment})</span>
+        </div>
       `;
-
-      card.innerHTML = header + scores + explanation + eventsHTML + graphButton;
-      resultsDiv.appendChild(card);
     });
-  } catch (err) {
-    console.error(err);
-    alert("⚠️ Failed to fetch scores");
+
+    eventsHTML += "</div>";
   }
+
+  // Graph button
+  const graphButton = `
+    <button class="graph-btn" onclick="viewGraphs('${ticker}')">📊 View Graphs</button>
+  `;
+
+  return header + scores + explanation + eventsHTML + graphButton;
 }
 
 // Navigate to graphs page
@@ -0,0 +1,264 @@
+# synthetic_data.py
+"""Synthetic ticker universe, headline streams and score history for scale testing.
+
+Features come out in exactly the shape build_features() returns, so they can be fed
+to explain_score() directly, written to scores.db, or used to train via train_model.py.
+
+Examples:
+    python synthetic_data.py --tickers 10000 --days 730 --interval-minutes 1440 --db synthetic.db
+    python synthetic_data.py --tickers 500 --days 30 --set pe_median=35 --set provider_error_rate=0.1
+    TICKER_UNIVERSE_FILE=universe.txt ...   # after --universe-file universe.txt
+"""
+import argparse
+import json
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+import db
+import score_store
+from model import rule_based_score
+
+# Every distribution the generator draws from; override any of them with --set name=value
+DEFAULTS = {
+    # daily % move: per-ticker volatility is lognormal, moves follow an AR(1) around 0
+    "vol_median_pct": 1.8,
+    "vol_sigma": 0.5,
+    "change_persistence": 0.9,
+    # fundamentals: per-ticker level, then a slow random walk
+    "pe_median": 22.0,
+    "pe_sigma": 0.5,
+    "pe_missing_rate": 0.1,
+    "de_median": 90.0,
+    "de_sigma": 0.8,
+    "log10_cap_min": 9.0,
+    "log10_cap_max": 12.5,
+    "eps_mean": 3.0,
+    "eps_sd": 4.0,
+    "book_mean": 20.0,
+    "book_sd": 15.0,
+    "fundamental_drift_sd": 0.002,
+    # news: per-ticker arrival rate (headlines/day, lognormal) and sentiment of each headline
+    "news_per_day_median": 5.0,
+    "news_sigma": 0.7,
+    "headlines_kept": 10,
+    "sentiment_mean": 0.05,
+    "sentiment_sd": 0.2,
+    # chance a single provider call "fails" and leaves its features at the defaults
+    "provider_error_rate": 0.02,
+}
+
+POSITIVE_TEMPLATES = [
+    "{co} posts record profit as demand surges",
+    "{co} announces partnership with {other}",
+    "Analysts upgrade {co} after strong guidance",
+    "{co} completes acquisition of {other} unit",
+    "{co} shares jump after results beat estimates",
+    "{co} unveils new product line",
+]
+NEGATIVE_TEMPLATES = [
+    "{co} faces lawsuit over product safety",
+    "Regulators open investigation into {co}",
+    "{co} downgrade follows weak quarter",
+    "{co} warns of restructuring costs",
+    "{co} misses forecasts, shares slide",
+]
+NEUTRAL_TEMPLATES = [
+    "{co} trading flat ahead of earnings",
+    "{co} to present at industry conference",
+    "{co} schedules annual shareholder meeting",
+    "What to watch for in {co} results this week",
+]
+
+NAME_PARTS = ["Acme", "Globex", "Initech", "Umbrella", "Stark", "Wayne", "Tyrell", "Cyberdyne",
+              "Soylent", "Hooli", "Vandelay", "Wonka", "Oscorp", "Aperture", "Massive", "Dynamic"]
+NAME_SUFFIXES = ["Corp", "Holdings", "Systems", "Industries", "Labs", "Group", "Energy", "Bio"]
+
+# -------------------------------
+# Universe
+# -------------------------------
+def make_universe(n: int, rng: random.Random, params: dict) -> List[dict]:
+    """Per-ticker profiles: name, volatility, news rate and starting fundamentals."""
+    universe = []
+    for i in range(n):
+        pe = 0.0 if rng.random() < params["pe_missing_rate"] else rng.lognormvariate(
+            math.log(params["pe_median"]), params["pe_sigma"])
+        universe.append({
+            "ticker": f"SYN{i:05d}",
+            "name": f"{rng.choice(NAME_PARTS)} {rng.choice(NAME_SUFFIXES)}",
+            "vol": rng.lognormvariate(math.log(params["vol_median_pct"]), params["vol_sigma"]),
+            "news_per_day": rng.lognormvariate(math.log(params["news_per_day_median"]), params["news_sigma"]),
+            "change_1d": 0.0,
+            "pe_ratio": pe,
+            "debt_to_equity": rng.lognormvariate(math.log(params["de_median"]), params["de_sigma"]),
+            "market_cap": 10 ** rng.uniform(params["log10_cap_min"], params["log10_cap_max"]),
+            "eps": rng.gauss(params["eps_mean"], params["eps_sd"]),
+            "book_value": rng.gauss(params["book_mean"], params["book_sd"]),
+            "headlines": [],
+        })
+    return universe
+
+# -------------------------------
+# Headlines
+# -------------------------------
+def make_headline(profile: dict, rng: random.Random, params: dict) -> Tuple[str, float]:
+    """One headline and its intended polarity."""
+    polarity = max(min(rng.gauss(params["sentiment_mean"], params["sentiment_sd"]), 1.0), -1.0)
+    if polarity > 0.15:
+        template = rng.choice(POSITIVE_TEMPLATES)
+    elif polarity < -0.15:
+        template = rng.choice(NEGATIVE_TEMPLATES)
+    else:
+        template = rng.choice(NEUTRAL_TEMPLATES)
+    other = f"{rng.choice(NAME_PARTS)} {rng.choice(NAME_SUFFIXES)}"
+    return template.format(co=profile["name"], other=other), polarity
+
+def advance_news(profile: dict, rng: random.Random, params: dict, step_days: float) -> float:
+    """Append the headlines that arrived during one step; returns the mean polarity of the kept set."""
+    arrivals = _poisson(rng, profile["news_per_day"] * step_days)
+    polarities = profile.setdefault("polarities", [])
+    for _ in range(arrivals):
+        headline, polarity = make_headline(profile, rng, params)
+        profile["headlines"].insert(0, headline)
+        polarities.insert(0, polarity)
+    keep = int(params["headlines_kept"])
+    del profile["headlines"][keep:]
+    del polarities[keep:]
+    return round(sum(polarities) / len(polarities), 2) if polarities else 0.0
+
+def _poisson(rng: random.Random, lam: float) -> int:
+    if lam <= 0:
+        return 0
+    if lam > 30:
+        return max(0, int(round(rng.gauss(lam, math.sqrt(lam)))))
+    # Knuth; fine for the small per-step rates used here
+    limit, k, p = math.exp(-lam), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return k
+        k += 1
+
+# -------------------------------
+# Features
+# -------------------------------
+def step_features(profile: dict, rng: random.Random, params: dict, step_days: float) -> dict:
+    """Advance one ticker by one step and return a build_features()-shaped dict."""
+    phi = params["change_persistence"] ** max(step_days, 1e-6)
+    noise = profile["vol"] * math.sqrt(max(1 - phi * phi, 0.0))
+    profile["change_1d"] = phi * profile["change_1d"] + rng.gauss(0, noise)
+
+    drift = params["fundamental_drift_sd"] * math.sqrt(step_days)
+    for key in ("pe_ratio", "debt_to_equity", "market_cap"):
+        profile[key] *= math.exp(rng.gauss(0, drift))
+    for key in ("eps", "book_value"):
+        profile[key] += rng.gauss(0, drift * max(abs(profile[key]), 1.0))
+
+    sentiment = advance_news(profile, rng, params, step_days)
+    errors = {src: None for src in ("yahoo", "alpha", "news")}
+    for src in errors:
+        if rng.random() < params["provider_error_rate"]:
+            errors[src] = f"Synthetic {src} error"
+
+    yahoo_ok, alpha_ok, news_ok = (errors[s] is None for s in ("yahoo", "alpha", "news"))
+    return {
+        "change_1d": round(profile["change_1d"], 2) if yahoo_ok else 0.0,
+        "pe_ratio": float(profile["pe_ratio"]) if yahoo_ok else 0.0,
+        "debt_to_equity": float(profile["debt_to_equity"]) if yahoo_ok else 0.0,
+        "market_cap": float(profile["market_cap"]) if alpha_ok else 0.0,
+        "eps": float(profile["eps"]) if alpha_ok else 0.0,
+        "book_value": float(profile["book_value"]) if alpha_ok else 0.0,
+        "news_sentiment": float(sentiment) if news_ok else 0.0,
+        "headlines": list(profile["headlines"]) if news_ok else [],
+        "errors": errors,
+    }
+
+def generate_history(universe: List[dict], start: datetime, end: datetime, interval_minutes: float,
+                     rng: random.Random, params: dict) -> Iterator[Tuple[datetime, str, dict]]:
+    """Time-ordered (timestamp, ticker, features) observations for every ticker in [start, end)."""
+    step = timedelta(minutes=interval_minutes)
+    step_days = interval_minutes / 1440
+    ts = start
+    while ts < end:
+        for profile in universe:
+            yield ts, profile["ticker"], step_features(profile, rng, params, step_days)
+        ts += step
+
+# -------------------------------
+# Writing
+# -------------------------------
+def seed_db(db_path: str, observations, details: bool = True, with_rollups: bool = True,
+            batch_size: int = 5000) -> int:
+    """Score each observation with rule_based_score and write it to score_store."""
+    score_store.ensure_schema(db_path)
+    con = db.connect(db_path)
+    entries, written = [], 0
+
+    def flush():
+        score_store.insert_scores(entries, source="synthetic", details=details, with_rollups=with_rollups, con=con)
+        con.commit()
+        entries.clear()
+
+    try:
+        for ts, ticker, features in observations:
+            rule_score, rule_hits = rule_based_score(features)
+            result = {"rule_score": rule_score, "ml_score": None, "final_score": float(rule_score),
+                      "rule_hits": rule_hits}
+            entries.append((ticker, ts, dict(features, ticker=ticker), result))
+            written += 1
+            if written % batch_size == 0:
+                flush()
+        flush()
+    finally:
+        con.close()
+    return written
+
+def parse_set(values: Optional[List[str]]) -> dict:
+    params = dict(DEFAULTS)
+    for item in values or []:
+        key, _, raw = item.partition("=")
+        if key not in DEFAULTS:
+            raise SystemExit(f"Unknown parameter {key!r}; known: {', '.join(sorted(DEFAULTS))}")
+        params[key] = type(DEFAULTS[key])(raw)
+    return params
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=1000)
+    parser.add_argument("--days", type=float, default=30, help="length of history to generate")
+    parser.add_argument("--interval-minutes", type=float, default=60, help="spacing between observations")
+    parser.add_argument("--end", help="last timestamp (ISO, UTC); defaults to now")
+    parser.add_argument("--db", default="synthetic.db", help="SQLite file to seed (use scores.db to seed the app)")
+    parser.add_argument("--no-details", action="store_true", help="skip score_details (explanations, headlines)")
+    parser.add_argument("--no-rollups", action="store_true", help="skip maintaining score_rollups")
+    parser.add_argument("--universe-file", help="also write the tickers, one per line, for TICKER_UNIVERSE_FILE")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--set", action="append", metavar="NAME=VALUE", help="override a distribution parameter")
+    parser.add_argument("--show-params", action="store_true", help="print the effective parameters and exit")
+    args = parser.parse_args()
+
+    params = parse_set(args.set)
+    if args.show_params:
+        print(json.dumps(params, indent=2))
+        return
+
+    rng = random.Random(args.seed)
+    universe = make_universe(args.tickers, rng, params)
+    if args.universe_file:
+        with open(args.universe_file, "w") as f:
+            f.write("\n".join(p["ticker"] for p in universe) + "\n")
+
+    end = datetime.fromisoformat(args.end) if args.end else datetime.utcnow().replace(microsecond=0)
+    start = end - timedelta(days=args.days)
+
+    started = time.time()
+    rows = seed_db(args.db, generate_history(universe, start, end, args.interval_minutes, rng, params),
+                   details=not args.no_details, with_rollups=not args.no_rollups)
+    elapsed = time.time() - started
+    print(f"✅ {rows} observations for {args.tickers} tickers written to {args.db} "
+          f"in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,148 @@
 # backend/train_model.py
-import sqlite3
+import argparse
+import os
 import pandas as pd
 import pickle
 import numpy as np
+from datetime import datetime
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import r2_score, mean_squared_error
 
+import db
+import feature_cache
+import parquet_export
+import score_store
+
 DB_PATH = "scores.db"
 MODEL_PATH = "ml_model.pkl"
 
-def load_data(db_path=DB_PATH):
-    """Load all snapshots from SQLite into a DataFrame."""
-    con = sqlite3.connect(db_path)
-    df = pd.read_sql("SELECT * FROM snapshots", con)
-    con.close()
-    return df
+TRAINING_COLUMNS = score_store.FEATURE_COLUMNS + ["rule_score"]
+# rows read per chunk, and the default cap on training rows (0 trains on every row)
+TRAIN_CHUNK_ROWS = int(os.environ.get("TRAIN_CHUNK_ROWS", 100000))
+TRAIN_SAMPLE_ROWS = int(os.environ.get("TRAIN_SAMPLE_ROWS", 0))
+SEED = 42
+N_ESTIMATORS = 200
+# a warm-started forest is refitted from scratch instead of growing past this many trees
+TRAIN_MAX_TREES = int(os.environ.get("TRAIN_MAX_TREES", 400))
+
+# -------------------------------
+# Streaming loader
+# -------------------------------
+class Reservoir:
+    """Uniform sample of at most `size` rows from a stream of float32 chunks (Algorithm R)."""
+
+    def __init__(self, size, width, seed=SEED):
+        self.data = np.empty((size, width), dtype=np.float32)
+        self.size = size
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, chunk):
+        n = len(chunk)
+        fill = min(max(self.size - self.seen, 0), n)
+        if fill:
+            self.data[self.seen:self.seen + fill] = chunk[:fill]
+        if fill < n:
+            # row i (0-based over the stream) replaces a random slot with probability size / (i + 1);
+            # later rows win on repeated slots, as in the sequential algorithm
+            idx = np.arange(self.seen + fill, self.seen + n)
+            slots = self.rng.integers(0, idx + 1)
+            keep = slots < self.size
+            self.data[slots[keep]] = chunk[fill:][keep]
+        self.seen += n
+
+    def result(self):
+        return self.data[:min(self.seen, self.size)]
+
+def _sql_chunks(db_path, since, chunk_rows):
+    """(row count, chunk generator) over the training columns in SQLite, read in one snapshot."""
+    sql, params = score_store.training_columns_sql(), []
+    if since is not None:
+        sql += " WHERE ts >= ?"
+        params.append(score_store.format_ts(since))
+    con = db.connect(db_path, isolation_level=None)
+    # one read transaction, so the count and the rows agree while the scheduler keeps writing
+    con.execute("BEGIN")
+    total = con.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+
+    def chunks():
+        try:
+            cur = con.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield np.array(rows, dtype=np.float32)  # NULL -> NaN
+        finally:
+            con.close()
+    return total, chunks()
+
+def _parquet_chunks(export_dir, since, chunk_rows):
+    total = parquet_export.count_rows(since=since, export_dir=export_dir)
+    def chunks():
+        for batch in parquet_export.iter_batches(TRAINING_COLUMNS, since=since, export_dir=export_dir,
+                                                 batch_size=chunk_rows):
+            if batch.num_rows:
+                yield np.column_stack([batch.column(i).to_numpy(zero_copy_only=False).astype(np.float32)
+                                       for i in range(batch.num_columns)])
+    return total, chunks()
+
+def load_arrays(db_path=DB_PATH, export_dir=parquet_export.EXPORT_DIR, since=None,
+                sample=TRAIN_SAMPLE_ROWS, chunk_rows=TRAIN_CHUNK_ROWS, seed=SEED):
+    """Features X and rule_score y as float32 arrays, read chunk by chunk.
+
+    Memory stays at one chunk plus the output: the output is sized from a row count up
+    front, or capped at `sample` rows drawn uniformly by reservoir sampling.
+    """
+    score_store.ensure_schema(db_path)  # imports legacy snapshots on first use
+    if parquet_export.available():
+        parquet_export.export(db_path, export_dir)
+        total, chunks = _parquet_chunks(export_dir, since, chunk_rows)
+    else:
+        total, chunks = _sql_chunks(db_path, since, chunk_rows)
 
-def train_ml_model():
-    df = load_data()
+    width = len(TRAINING_COLUMNS)
+    if sample and sample < total:
+        reservoir = Reservoir(sample, width, seed)
+        for chunk in chunks:
+            reservoir.add(chunk)
+        data = reservoir.result()
+    else:
+        data = np.empty((total, width), dtype=np.float32)
+        filled = 0
+        for chunk in chunks:
+            n = min(len(chunk), total - filled)
+            data[filled:filled + n] = chunk[:n]
+            filled += n
+        data = data[:filled]
+    return data[:, :-1], data[:, -1]
 
-    if len(df) < 20:
-        raise ValueError(f"❌ Not enough rows in DB to train model. Have {len(df)}, need at least 20.")
+def train_ml_model(db_path=DB_PATH, model_path=MODEL_PATH, export_dir=parquet_export.EXPORT_DIR, since=None,
+                   sample=TRAIN_SAMPLE_ROWS, chunk_rows=TRAIN_CHUNK_ROWS):
+    # Features (inputs) and Target (output); rule_score is the proxy label
+    X, y = load_arrays(db_path, export_dir, since, sample, chunk_rows)
 
-    # Features (inputs) and Target (output)
-    X = df[[
-        "change_1d", "debt_to_equity", "pe_ratio",
-        "market_cap", "eps", "book_value", "news_sentiment"
-    ]]
-    y = df["rule_score"]  # we use rule_score as proxy label
+    if len(X) < 20:
+        raise ValueError(f"❌ Not enough rows in DB to train model. Have {len(X)}, need at least 20.")
+    print(f"📥 Loaded {len(X)} rows ({(X.nbytes + y.nbytes) / 1e6:.1f} MB as float32)")
+
+    # the forest was fitted on a DataFrame before, so keep the column names for predict()
+    X = pd.DataFrame(X, columns=score_store.FEATURE_COLUMNS, copy=False)
 
     # Split train/test
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42
     )
 
-    # Train model
-    model = RandomForestRegressor(n_estimators=200, random_state=42)
+    # Train model on every core; predict() in the app is single-row, where a thread pool only adds latency
+    model = RandomForestRegressor(n_estimators=N_ESTIMATORS, random_state=42, n_jobs=-1)
     model.fit(X_train, y_train)
+    model.n_jobs = 1
+
+    evaluate_and_save(model, X_test, y_test, model_path)
 
+def evaluate_and_save(model, X_test, y_test, model_path):
     # Evaluate
     preds = model.predict(X_test)
     r2 = r2_score(y_test, preds)
@@ -49,10 +153,82 @@ def train_ml_model():
     print(f"✅ Model trained: R²={r2:.3f}, RMSE={rmse:.2f}")
 
     # Save model
-    with open(MODEL_PATH, "wb") as f:
+    with open(model_path, "wb") as f:
         pickle.dump(model, f)
 
-    print(f"📦 Model saved to {MODEL_PATH}")
+    print(f"📦 Model saved to {model_path}")
+
+# -------------------------------
+# Cached, incremental retraining
+# -------------------------------
+def holdout_mask(n):
+    """Every 5th row by a fixed hash of its cache position, so a row is test data in every run.
+
+    A warm-started forest therefore never scores its held-out rows with trees that trained on them.
+    """
+    return (np.arange(n, dtype=np.uint64) * np.uint64(2654435761) % np.uint64(2 ** 32)) % np.uint64(5) == 0
+
+def train_cached(db_path=DB_PATH, model_path=MODEL_PATH, cache_dir=feature_cache.CACHE_DIR, warm_trees=0):
+    """Retrain from the feature_cache matrix after appending new rows only.
+
+    With warm_trees, the saved forest keeps its trees and grows `warm_trees` more on the
+    current data instead of being refitted from zero.
+    """
+    score_store.ensure_schema(db_path)  # imports legacy snapshots on first use
+    stats = feature_cache.update(db_path, cache_dir)
+    X, y = feature_cache.load(cache_dir)
+    print(f"📥 Feature cache: +{stats['appended']} new rows, {stats['rows']} total (up to id {stats['last_id']})")
+    if len(X) < 20:
+        raise ValueError(f"❌ Not enough rows in DB to train model. Have {len(X)}, need at least 20.")
+
+    test = holdout_mask(len(X))
+    # same column names as train_ml_model, so predict() on a feature DataFrame does not warn
+    X_train = pd.DataFrame(X[~test], columns=score_store.FEATURE_COLUMNS, copy=False)
+    X_test = pd.DataFrame(X[test], columns=score_store.FEATURE_COLUMNS, copy=False)
+    y_train = y[~test]
+
+    model = None
+    if warm_trees and os.path.exists(model_path):
+        with open(model_path, "rb") as f:
+            model = pickle.load(f)
+        if not isinstance(model, RandomForestRegressor) or model.n_features_in_ != X.shape[1]:
+            print("⚠️ Saved model is not a forest over these features; fitting from zero")
+            model = None
+        elif model.n_estimators + warm_trees > TRAIN_MAX_TREES:
+            print(f"⚠️ Forest would exceed {TRAIN_MAX_TREES} trees; fitting from zero")
+            model = None
+    if model is not None:
+        print(f"🌲 Warm start: {model.n_estimators} existing trees + {warm_trees} new")
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + warm_trees, n_jobs=-1)
+    else:
+        model = RandomForestRegressor(n_estimators=N_ESTIMATORS, random_state=42, n_jobs=-1)
+    model.fit(X_train, y_train)
+    model.set_params(warm_start=False, n_jobs=1)
+
+    evaluate_and_save(model, X_test, y[test], model_path)
 
 if __name__ == "__main__":
-    train_ml_model()
+    parser = argparse.ArgumentParser(description="Train the RF score model from the stored scores.")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite file to read (e.g. one seeded by synthetic_data.py)")
+    parser.add_argument("--export-dir", default=parquet_export.EXPORT_DIR,
+                        help="Parquet export of that DB (keep one directory per DB)")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="only train on scores from this time on")
+    parser.add_argument("--model-out", default=MODEL_PATH)
+    parser.add_argument("--sample", type=int, default=TRAIN_SAMPLE_ROWS,
+                        help="train on a uniform sample of at most this many rows (0 = all)")
+    parser.add_argument("--chunk-rows", type=int, default=TRAIN_CHUNK_ROWS, help="rows read per chunk")
+    parser.add_argument("--search", action="store_true",
+                        help="pick the model by parallel hyperparameter search (see model_search.py)")
+    parser.add_argument("--cached", action="store_true",
+                        help="train from the incrementally appended feature cache (see feature_cache.py)")
+    parser.add_argument("--cache-dir", default=feature_cache.CACHE_DIR)
+    parser.add_argument("--warm-trees", type=int, default=0,
+                        help="with --cached, add this many trees to the saved forest instead of refitting")
+    args = parser.parse_args()
+    if args.cached:
+        train_cached(args.db, args.model_out, args.cache_dir, args.warm_trees)
+    elif args.search:
+        import model_search
+        model_search.run(args.db, args.model_out, args.export_dir, args.since, args.sample)
+    else:
+        train_ml_model(args.db, args.model_out, args.export_dir, args.since, args.sample, args.chunk_rows)
@@ -0,0 +1,140 @@
+# write_behind.py
+"""Background persistence for scores so request handlers never wait on SQLite.
+
+Handlers and the refresh scheduler submit() finished scores; one writer thread per
+process drains the queue and writes score rows, rollups and chart aggregates in
+batched transactions, retrying a batch that hits a locked database. Reads may lag a
+write by up to WRITE_FLUSH_MS.
+"""
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import chart_aggregates
+import db
+import metrics
+import score_store
+
+# Most scores held in memory before submit() blocks the caller
+WRITE_QUEUE_MAX = int(os.environ.get("WRITE_QUEUE_MAX", 5000))
+# Largest batch written in one transaction
+WRITE_BATCH_SIZE = int(os.environ.get("WRITE_BATCH_SIZE", 200))
+# How long the writer waits for more scores before committing a partial batch
+WRITE_FLUSH_MS = float(os.environ.get("WRITE_FLUSH_MS", 50))
+# How long a full queue may block a caller before it writes inline instead
+WRITE_BLOCK_TIMEOUT_S = float(os.environ.get("WRITE_BLOCK_TIMEOUT_S", 5))
+# Attempts per batch before it is dropped; waits double from WRITE_RETRY_DELAY_S between them,
+# which rides out a lock held by VACUUM, the legacy import or a collector batch
+WRITE_RETRIES = int(os.environ.get("WRITE_RETRIES", 5))
+WRITE_RETRY_DELAY_S = float(os.environ.get("WRITE_RETRY_DELAY_S", 0.5))
+
+Entry = Tuple[str, datetime, Dict[str, Any], Dict[str, Any]]
+
+_STOP = object()
+
+class ScoreWriter:
+    def __init__(self, db_path: str = score_store.DB_PATH, maxsize: int = WRITE_QUEUE_MAX,
+                 batch_size: int = WRITE_BATCH_SIZE, flush_ms: float = WRITE_FLUSH_MS):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_s = flush_ms / 1000
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        # started lazily, and again after fork, since threads do not survive into gunicorn workers
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="score-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, ticker: str, features: Dict[str, Any], result: Dict[str, Any], timestamp: datetime):
+        """Queue one score. Blocks while the queue is full; past the timeout the score is written inline."""
+        self._ensure_started()
+        entry = (ticker, timestamp, dict(features), dict(result))
+        try:
+            self._queue.put(entry, timeout=WRITE_BLOCK_TIMEOUT_S)
+        except queue.Full:
+            metrics.record_error("write_queue_full")
+            self._write([entry])
+        metrics.set_gauge("write_queue_depth", self._queue.qsize())
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self):
+        """Block until everything submitted so far is on disk."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self, timeout: float = 30):
+        """Drain the queue and stop the writer (called from the atexit hook)."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch: List[Entry] = []
+            item = self._queue.get()
+            stop = item is _STOP
+            if not stop:
+                batch.append(item)
+                deadline = time.monotonic() + self.flush_s
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+            try:
+                if batch:
+                    self._write(batch)
+            finally:
+                for _ in range(len(batch) + int(stop)):
+                    self._queue.task_done()
+                metrics.set_gauge("write_queue_depth", self._queue.qsize())
+            if stop:
+                return
+
+    def _write(self, batch: List[Entry]):
+        delay = WRITE_RETRY_DELAY_S
+        for attempt in range(1, WRITE_RETRIES + 1):
+            try:
+                with metrics.timed("score_write_batch"):
+                    self._write_once(batch)
+                metrics.set_gauge("write_last_batch_size", len(batch))
+                return
+            except Exception as e:
+                metrics.record_error("score_write")
+                if attempt == WRITE_RETRIES:
+                    metrics.record_error("score_write_dropped")
+                    print(f"❌ Score writer dropped {len(batch)} score(s) after {attempt} attempts: {e}")
+                    return
+                print(f"⚠️ Score writer attempt {attempt} failed, retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+                delay *= 2
+
+    def _write_once(self, batch: List[Entry]):
+        """Score rows, rollups and chart aggregates for the batch in one transaction."""
+        con = db.connect(self.db_path, timeout=10)
+        try:
+            # IMMEDIATE: the chart aggregate fold reads then rewrites each ticker's row
+            con.execute("BEGIN IMMEDIATE")
+            score_store.insert_scores(batch, con=con)
+            chart_aggregates.update_many([(ticker, result, ts) for ticker, ts, _, result in batch], con=con)
+            con.commit()
+        finally:
+            con.close()